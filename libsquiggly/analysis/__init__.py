@@ -1,4 +1,7 @@
 # Only export very specific items
-from .matched_filter import energy, matched_filter, subsample_matched_filter
-from .rolling_abs_mean import rolling_abs_mean
-from .peak_suppression import suppress_peaks
+from .matched_filter import energy, matched_filter, matched_filter_chunks, matched_filter_array, MatchedFilter
+from .matched_filter import subsample_matched_filter, subsample_matched_filter_chunks, SubsampleMatchedFilter
+from .rolling_abs_mean import rolling_abs_mean, rolling_abs_mean_chunks, RollingAbsMean
+from .rolling_stats import rolling_stat, rolling_stat_chunks, rolling_stat_array, RollingStatistic
+from .peak_suppression import suppress_peaks, suppress_peaks_chunks, suppress_peaks_array, PeakSuppressor
+from .peak_suppression import detection_dtype, PeakDetector, DetectingStream
@@ -1,6 +1,9 @@
 from numpy import *
-from ..util import make_gen
+from numpy.fft import fft, ifft, rfft, irfft
+from numpy.lib.stride_tricks import as_strided
+from ..util import unchunk, stream_chunks
 from ..resampling import sinc_fractional_shift
+from .peak_suppression import DetectingStream
 
 
 def energy(x, demeaned=False):
@@ -26,7 +29,7 @@ def energy(x, demeaned=False):
         return sqrt(real(vdot(x, x)))
 
 
-def matched_filter(data, h, step=1, mode="same"):
+def matched_filter(data, h, step=1, mode="same", chunk_size=4096, detect_thresh=None):
     """
     Perform matched filtering between a datastream and an array representing the template filter
     The result from this function is normalized to fall within the range [0, 1]
@@ -44,6 +47,12 @@ def matched_filter(data, h, step=1, mode="same"):
         Similar to numpy.convolve(); output length should be "same" or "valid" to disable/enable
         chomping of output that is due to transient response at the beginning/end of a stream.
         Note that since this function assumes an infinite stream, it only bothers with the beginning
+    chunk_size : int (default: 4096)
+        Number of samples of array `data` to filter at once, see matched_filter_chunks()
+    detect_thresh : number (default: None)
+        If given, emit a detection (see detection_dtype()) for the peak of every run of outputs
+        whose magnitude exceeds `detect_thresh`, as suppress_peaks() would find, rather than
+        every output.  The `index` of each detection counts outputs, not samples of `data`.
 
     Return values
     -------------
@@ -54,46 +63,252 @@ def matched_filter(data, h, step=1, mode="same"):
         Alternatively, use the acollect() function in libsquiggly.util:
             data_hat = acollect(matched_filter(data[startIdx:], barker))
     """
-    data = make_gen(data)
+    return unchunk(matched_filter_chunks(data, h, step, mode, chunk_size, detect_thresh))
 
-    # Demean/normalize h first, so that we never have to do it again
-    h = copy(h) - mean(h)
-    h = h / energy(h, demeaned=True)
-    h_len = len(h)
 
-    # Grab the first element
-    x = next(data)
+def matched_filter_chunks(data, h, step=1, mode="same", chunk_size=4096, detect_thresh=None):
+    """
+    Perform matched filtering between a datastream and an array representing the template filter,
+    one chunk at a time: like matched_filter(), but yielding arrays of outputs rather than single
+    outputs, so that long streams do not pay for a trip through the interpreter per sample.
+
+    Parameters
+    ----------
+    data : 1-D signal (array or iterator)
+        The actual timeseries to filter through.  This can be an array, an iterator of samples or an
+        iterator of arrays of samples (see make_chunks() in libsquiggly.util)
+    h, step, mode, detect_thresh :
+        See matched_filter()
+    chunk_size : int (default: 4096)
+        Number of samples of array `data` to filter at once
+
+    Return values
+    -------------
+    data_hat : 1-D signal array stream
+        This function acts as a generator, yielding an array of outputs for every chunk of `data`
+        that completes at least one output (or detection)
+    """
+    stream = MatchedFilter(h, step, mode, chunk_size)
+    if detect_thresh is not None:
+        stream = DetectingStream(stream, detect_thresh)
+    return stream_chunks(stream, data, chunk_size)
+
+
+def normalized_template(h):
+    """
+    Demean and normalize the template filter `h` to unit energy, as matched_filter() does.  A
+    2-D `h` holds a bank of templates, one per row, each of which is normalized separately.
+    """
+    h = asarray(h)
+    h = h - mean(h, axis=-1)[..., newaxis]
+    return h / sqrt(real(sum(h * conj(h), axis=-1)))[..., newaxis]
+
+
+def first_window_end(h_len, step=1, mode="same"):
+    """
+    Return the index of the last sample of the data window behind the first output of
+    matched_filter(): sample `step - 1` ("same", the window being zero-padded before
+    the start of the data) or, skipping the transient, sample `h_len` ("valid").
+    Every later window ends `step` samples after the last.
+    """
+    if mode == "same":
+        return step - 1
+    elif mode == "valid":
+        return max(step - 1, h_len)
+    raise ValueError("Unrecognized `mode` value: " + mode)
+
+
+def correlate_windows(x, h, H, fft_len):
+    """
+    Calculate the normalized cross-correlation of the (demeaned, normalized) template
+    `h` against every `len(h)`-sample window of `x`, returning `len(x) - len(h) + 1`
+    values.  The numerator is calculated by FFT overlap-save (or directly, for only a
+    few windows), `H` being the length `fft_len` transform of `h[::-1]` (or its real
+    transform, when `x` and `h` are both real), and the mean and energy of every
+    window from cumulative sums over `x`.  `len(x)` must not exceed `fft_len`.
+
+    A 2-D `h` (and `H`) holds a bank of templates, one per row, all correlated in the
+    same batched FFT against the same windows, whose mean and energy are shared.  One
+    row of values is returned per template.
+    """
+    h_len = h.shape[-1]
+    n = len(x) - h_len + 1
+
+    # The normalized cross-correlation does not change when x is offset, so centre x on
+    # the mean of its last window, lest the running sums of a signal with a large DC
+    # offset cancel each other out
+    x = x - mean(x[-h_len:])
+    s = x.strides[0]
+    if n * h_len < fft_len:
+        # A handful of windows (as when streaming a sample at a time) are cheaper to
+        # correlate directly
+        corr = dot(h, as_strided(x, shape=(n, h_len), strides=(s, s)).T)
+    elif H.shape[-1] == fft_len:
+        corr = ifft(fft(x, fft_len) * H)[..., h_len - 1:h_len - 1 + n]
+    else:
+        corr = irfft(rfft(x, fft_len) * H, fft_len)[..., h_len - 1:h_len - 1 + n]
+
+    # Running sums are taken over this block only, bounding round-off drift
+    S1 = cumsum(hstack(([0], x)))
+    S1 = S1[h_len:] - S1[:n]
+    S2 = cumsum(hstack(([0], real(x * conj(x)))))
+    block_energy = S2[-1]
+    S2 = S2[h_len:] - S2[:n]
+
+    # Demeaning the window only changes the numerator through the sum of h
+    mu = S1 / h_len
+    corr -= mu * sum(h, axis=-1)[..., newaxis]
+    x_energy = S2 - real(mu * conj(mu)) * h_len
+
+    # Round-off in the FFT and the running sums scales with the energy of the whole block,
+    # so windows holding a tiny share of it (those far from the level of the last window,
+    # or quiet next to a far louder stretch) are correlated directly
+    inexact = flatnonzero(x_energy <= 1e-8 * block_energy)
+    if len(inexact):
+        windows = as_strided(x, shape=(n, h_len), strides=(s, s))[inexact]
+        windows = windows - mean(windows, axis=1)[:, newaxis]
+        corr[..., inexact] = dot(h, windows.T)
+        x_energy[inexact] = sum(real(windows * conj(windows)), axis=1)
+
+    # Windows with no energy (to within round-off) correlate to zero
+    silent = x_energy <= 1e-24 * S2
+    x_energy[silent] = 1
+    corr /= sqrt(x_energy)
+    corr[..., silent] = 0
+    return corr
+
+
+def matched_filter_array(x, h, step=1, mode="same", block_size=4096):
+    """
+    Perform matched filtering between an array and an array representing the template
+    filter, returning the same values as collecting every output of matched_filter(),
+    but calculated a block at a time: the numerator of the normalized cross-correlation
+    by FFT overlap-save, and the mean and energy of every data window by cumulative
+    sums.
 
-    # Load in a single step
-    buff = zeros((len(h),), x.dtype)
-    buff[-1] = x
-    for idx in range(step - 1):
-        buff = roll(buff, -1, 0)
-        buff[-1] = next(data)
+    Parameters
+    ----------
+    x : 1-D signal array
+        The actual timeseries to filter through
+    h : 1-D signal
+        The filter to be used as the template filter to be searched for.  A 2-D array holds a
+        bank of templates, one per row, correlated together against the same data windows, in
+        which case one row of outputs is returned per template.
+    step : int (default: 1)
+        Output decimation, see matched_filter()
+    mode : string
+        "same" or "valid", see matched_filter()
+    block_size : int (default: 4096)
+        Number of samples to correlate at once, rounded so that each FFT is a power of two
+
+    Return values
+    -------------
+    data_hat : 1-D signal array
+        The normalized cross-correlation at every output of matched_filter()
+    """
+    return MatchedFilter(h, step, mode, block_size).push(x)
+
+
+class MatchedFilter:
+    """
+    Perform matched filtering of a continuous stream against a template filter, one chunk at a
+    time.  Feed chunks of any size into push(), which returns the outputs of matched_filter()
+    completed by that chunk, calculated as matched_filter_array() does.  Only the samples still
+    needed by later data windows are held onto between chunks.
+
+    Constructor parameters
+    ----------------------
+    h, step, mode :
+        See matched_filter(), or matched_filter_array() for a bank of templates
+    block_size : int (default: 4096)
+        See matched_filter_array()
+    """
+
+    def __init__(self, h, step=1, mode="same", block_size=4096):
+        self.h = normalized_template(h)
+        self.step = step
+        self.h_len = self.h.shape[-1]
+        self.first = first_window_end(self.h_len, step, mode)
+        self.fft_len = 2 ** int(ceil(log2(max(block_size, 2 * self.h_len))))
 
-    # if mode is "valid", skip over any extra samples that we need to to skip
-    # the transient response
-    if mode == "valid":
-        for idx in range(len(h) - (step - 1)):
-            buff = roll(buff, -1, 0)
-            buff[-1] = next(data)
+        # The transform of the template, for real and for complex data
+        h_reversed = self.h[..., ::-1]
+        self.H_real = rfft(h_reversed, self.fft_len) if isrealobj(self.h) else None
+        self.H_complex = fft(h_reversed, self.fft_len)
+        self.reset()
 
-    # Calculate dot product at each point, normalizing out x's energy
-    while True:
-        x_slice = buff - mean(buff)
-        x_slice_energy = energy(x_slice)
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        # Samples that later windows still need, starting at stream index stream_start.
+        # Windows reaching back before the start of the stream see zeros.
+        self.stream_buff = zeros(self.h_len - 1)
+        self.stream_start = 1 - self.h_len
 
-        if x_slice_energy == 0.0:
-            yield 0.0
-        else:
-            yield dot(x_slice, h) / x_slice_energy
+        # The stream index of the last sample of the next window to correlate
+        self.next_end = self.first
 
-        for idx in range(step):
-            buff = roll(buff, -1, 0)
-            buff[-1] = next(data)
+    def segment(self, x, start, stop):
+        """
+        Return samples `start` through `stop - 1` of the held samples followed by `x`
+        """
+        n = len(self.stream_buff)
+        if stop <= n:
+            return self.stream_buff[start:stop]
+        if start >= n:
+            return x[start - n:stop - n]
+        return concatenate((self.stream_buff[start:], x[:stop - n]))
 
+    def push(self, x):
+        """
+        Feed the next chunk of the stream into the matched filter, returning an array of the
+        outputs it completes
 
-def subsample_matched_filter(data, h, M=5, mode="same"):
+        Parameters
+        ----------
+        x : 1-D signal array
+            The next chunk of the stream
+        """
+        x = asarray(x)
+        h_len = self.h_len
+        step = self.step
+        total = len(self.stream_buff) + len(x)
+        stream_stop = self.stream_start + total
+        count = max(0, -(-(stream_stop - self.next_end) // step))
+        out = zeros(self.h.shape[:-1] + (count,), dtype=result_type(x, self.h, float64))
+        H = self.H_complex if iscomplexobj(out) else self.H_real
+
+        # Each block correlates up to fft_len - h_len + 1 windows, sharing an FFT size
+        B = self.fft_len - h_len + 1
+        first = self.next_end - self.stream_start
+        k = 0
+        while k < count:
+            # Correlate the windows ending at outputs k through k_stop - 1
+            k_stop = min(count, k + (B - 1) // step + 1)
+            start = first + k * step - h_len + 1
+            stop = first + (k_stop - 1) * step + 1
+            out[..., k:k_stop] = correlate_windows(self.segment(x, start, stop), self.h, H, self.fft_len)[..., ::step]
+            k = k_stop
+        self.next_end += count * step
+
+        # Hold onto the samples the next window needs
+        keep = min(max(self.next_end - h_len + 1 - self.stream_start, 0), total)
+        self.stream_buff = array(self.segment(x, keep, total))
+        self.stream_start += keep
+        return out
+
+    def flush(self):
+        """
+        End the stream fed in through push(), resetting it.  Every output is returned by push() as
+        soon as its data window is complete, so there are none left to return.
+        """
+        self.reset()
+        return zeros(self.h.shape[:-1] + (0,))
+
+
+def subsample_matched_filter(data, h, M=5, mode="same", chunk_size=4096, return_phase=False,
+                             detect_thresh=None):
     """
     Perform matched filtering between a datastream and an array representing the template filter
     The result from this function is normalized to fall within the range [0, 1]
@@ -101,7 +316,9 @@ def subsample_matched_filter(data, h, M=5, mode="same"):
     This function differs from matched_filter() in that it creates a polyphase matched
     filterbank to detect subsample shifted template filters embedded in data. The parameter
     M controls the number of evenly-spaced, shifted matched filters created. The result
-    returned is the maximum absolute value across polyphase matched filters.
+    returned is the maximum absolute value across polyphase matched filters.  Every shifted
+    template is correlated in the same batched FFT, sharing the mean and energy of each data
+    window between them.
 
     Parameters
     ----------
@@ -115,6 +332,14 @@ def subsample_matched_filter(data, h, M=5, mode="same"):
         Similar to numpy.convolve(); output length should be "same" or "valid" to disable/enable
         chomping of output that is due to transient response at the beginning/end of a stream.
         Note that since this function assumes an infinite stream, it only bothers with the beginning
+    chunk_size : int (default: 4096)
+        Number of samples of array `data` to filter at once, see matched_filter_chunks()
+    return_phase : bool (default: False)
+        Also return the index `m` of the winning polyphase matched filter, whose template is
+        shifted by `m / M` samples, for sub-sample timing
+    detect_thresh : number (default: None)
+        If given, emit detections rather than every output, see matched_filter().  Each
+        detection records the winning `phase` and its sub-sample `offset`.
 
     Return values
     -------------
@@ -124,20 +349,80 @@ def subsample_matched_filter(data, h, M=5, mode="same"):
             data_hat = [x for x in subsample_matched_filter(data[startIdx:], barker)]
         Alternatively, use the acollect() function in libsquiggly.util:
             data_hat = acollect(subsample_matched_filter(data[startIdx:], barker))
+        With `return_phase`, each sample is a `(value, phase)` record instead.
+    """
+    return unchunk(subsample_matched_filter_chunks(data, h, M, mode, chunk_size, return_phase,
+                                                   detect_thresh))
+
+
+def subsample_matched_filter_chunks(data, h, M=5, mode="same", chunk_size=4096, return_phase=False,
+                                   detect_thresh=None):
     """
+    Perform polyphase matched filtering between a datastream and an array representing the template
+    filter, one chunk at a time: like subsample_matched_filter(), but yielding arrays of outputs
+    rather than single outputs.  See matched_filter_chunks() and subsample_matched_filter() for the
+    parameters.  With `return_phase`, structured arrays with `value` and `phase` fields are yielded,
+    and with `detect_thresh`, arrays of detections.
+    """
+    if detect_thresh is not None:
+        stream = DetectingStream(SubsampleMatchedFilter(h, M, mode, chunk_size, True), detect_thresh, M)
+    else:
+        stream = SubsampleMatchedFilter(h, M, mode, chunk_size, return_phase)
+    return stream_chunks(stream, data, chunk_size)
+
+
+class SubsampleMatchedFilter:
+    """
+    Perform polyphase matched filtering of a continuous stream, one chunk at a time.  Feed chunks
+    of any size into push(), which returns the outputs of subsample_matched_filter() completed by
+    that chunk.  Every shifted template is correlated as one bank of templates by a single
+    `MatchedFilter`.
+
+    Constructor parameters
+    ----------------------
+    h, M, mode, return_phase :
+        See subsample_matched_filter()
+    block_size : int (default: 4096)
+        See matched_filter_array()
+    """
+
+    def __init__(self, h, M=5, mode="same", block_size=4096, return_phase=False):
+        # Stack one template for each fractional shift we want to perform
+        bank = array([sinc_fractional_shift(h, idx * 1.0 / M) for idx in range(M)])
+        self.mfilt = MatchedFilter(bank, 1, mode, block_size)
+        self.return_phase = return_phase
 
-    data = make_gen(data)
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.mfilt.reset()
 
-    # Create one matched filter for each fractional shift we want to perform
-    mfilts = [matched_filter(data.copy(), sinc_fractional_shift(
-        h, idx * 1.0 / M)) for idx in range(M)]
+    def select(self, mfilt_outputs):
+        """
+        Return the (complex) output with the maximum absolute value at each time index of the
+        `(M, n)` polyphase outputs, along with the phase it came from if `return_phase` is set
+        """
+        n = mfilt_outputs.shape[1]
+        phases = argmax(abs(mfilt_outputs), axis=0)
+        values = mfilt_outputs[phases, arange(n)]
+        if not self.return_phase:
+            return values
 
-    while True:
-        # Get the outputs of all matched filters
-        mfilt_outputs = array([next(mfilts[idx]) for idx in range(M)])
+        out = zeros(n, dtype=[("value", values.dtype), ("phase", intp)])
+        out["value"] = values
+        out["phase"] = phases
+        return out
 
-        # Find the maximum absolute value
-        maxind = argmax(abs(mfilt_outputs))
+    def push(self, x):
+        """
+        Feed the next chunk of the stream into the polyphase matched filter, returning an array
+        of the outputs it completes
+        """
+        return self.select(self.mfilt.push(x))
 
-        # Yield that (complex) value
-        yield mfilt_outputs[maxind]
+    def flush(self):
+        """
+        End the stream fed in through push(), resetting it
+        """
+        return self.select(self.mfilt.flush())
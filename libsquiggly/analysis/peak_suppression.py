@@ -1,5 +1,5 @@
 from numpy import *
-from ..util import make_gen
+from ..util import unchunk, stream_chunks
 
 
 def mask_peaks(peaks):
@@ -9,7 +9,61 @@ def mask_peaks(peaks):
     return array(peaks) * (arange(len(peaks)) == argmax(peaks))
 
 
-def suppress_peaks(data, thresh):
+def find_runs(above):
+    """
+    Given a boolean array, return the start and stop indices of every run of True values
+    """
+    edges = diff(concatenate(([0], asarray(above, dtype=int8), [0])))
+    return flatnonzero(edges == 1), flatnonzero(edges == -1)
+
+
+def run_peaks(x, starts, stops):
+    """
+    Return the index of the maximum of every run `x[starts[i]:stops[i]]`, taking the first of
+    equal maxima as mask_peaks() does
+    """
+    if len(starts) == 0:
+        return zeros(0, dtype=intp)
+
+    # Gather the runs together, so that each can be reduced with a single reduceat()
+    lengths = stops - starts
+    run_ids = repeat(arange(len(starts)), lengths)
+    run_starts = cumsum(lengths) - lengths
+    idxs = arange(len(run_ids)) - run_starts[run_ids] + starts[run_ids]
+    vals = x[idxs]
+
+    # Find the first sample of each run that reaches its maximum
+    is_max = flatnonzero(vals == maximum.reduceat(vals, run_starts)[run_ids])
+    first = concatenate(([True], run_ids[is_max[1:]] != run_ids[is_max[:-1]]))
+    return idxs[is_max[first]]
+
+
+def suppress_peaks_array(x, thresh):
+    """
+    Suppress neighboring, smaller peaks within the array `x` all at once: like suppress_peaks(),
+    but returning the whole peakstream as an array.  A run of peaks reaching the end of `x` is
+    treated as ended.
+    """
+    x = asarray(x)
+    out = zeros_like(x)
+    peaks = run_peaks(x, *find_runs(abs(x) > thresh))
+    out[peaks] = x[peaks]
+    return out
+
+
+def detection_dtype(value_dtype=complex128):
+    """
+    Return the dtype of the detections emitted by PeakDetector for peaks of dtype `value_dtype`:
+    records of the sample `index` and `value` of each peak, the `run_length` of the run of
+    samples above the threshold it was the maximum of, and the `phase` of the polyphase matched
+    filter it came from (see subsample_matched_filter()) along with the sub-sample `offset` of
+    that phase's template, in samples
+    """
+    return dtype([("index", intp), ("value", value_dtype), ("run_length", intp),
+                  ("offset", float64), ("phase", intp)])
+
+
+def suppress_peaks(data, thresh, chunk_size=4096, output="peakstream"):
     """
     Find peaks in data, suppressing neighboring, smaller peaks in the event that we
     are using some kind of nois detector (such as subsample_matched_filter()) that
@@ -23,36 +77,244 @@ def suppress_peaks(data, thresh):
         The signal stream to suppress peaks in
     thresh : number
         The threshold to define peaky areas
+    chunk_size : int (default: 4096)
+        Number of samples of array `data` to process at once
+    output : string
+        What to emit.  One of:
+        * "peakstream": every sample, with all but the peaks set to zero (default)
+        * "detections": a detection record for every peak alone, see detection_dtype(), so
+            that long streams with few events need not be kept around
 
     Return values
     -------------
     peakstream : 1-D signal
-        A stream of peaks with all other values set to zero
-    """
-    data = make_gen(data)
-
-    while True:
-        # Always reset our data window
-        data_win = [next(data)]
-
-        try:
-            # Read stuff into data_win as long as the data exceeds threshold
-            while abs(data_win[-1]) > thresh:
-                data_win += [next(data)]
-        except StopIteration:
-            # Yield any values if we have them
-            if len(data_win):
-                for val in mask_peaks(data_win):
-                    yield val
-
-            # Finally, re-raise the StopIteration
-            raise StopIteration()
-
-        # The number of thresh-surpassing points is len(data_win) - 1:
-        if len(data_win) > 1:
-            for val in mask_peaks(data_win[:-1]):
-                yield val
-
-        # No matter what, we always yield a 0 here for the last data point that
-        # didn't exceed thresh
-        yield data_win[0] * 0
+        A stream of peaks with all other values set to zero, or of detections
+    """
+    return unchunk(suppress_peaks_chunks(data, thresh, chunk_size, output))
+
+
+def suppress_peaks_chunks(data, thresh, chunk_size=4096, output="peakstream"):
+    """
+    Find peaks in data one chunk at a time: like suppress_peaks(), but yielding arrays of the
+    peakstream (or of detections) rather than single values.  `data` may also be an iterator of
+    arrays.
+    """
+    if output == "peakstream":
+        return stream_chunks(PeakSuppressor(thresh), data, chunk_size)
+    elif output == "detections":
+        return stream_chunks(PeakDetector(thresh), data, chunk_size)
+    raise ValueError("Unrecognized `output` value: " + output)
+
+
+class PeakDetector:
+    """
+    Detect the peaks of a continuous stream, one chunk at a time: the maximum of every run of
+    samples whose magnitude exceeds a threshold, as suppress_peaks() keeps.  Feed chunks of any
+    size into push(), which returns a detection (see detection_dtype()) for every run that chunk
+    ends, then call flush() once the stream has ended to detect the run left open.  Only the
+    length and maximum of an open run are held onto, so runs may span any number of chunks.
+
+    Constructor parameters
+    ----------------------
+    thresh : number
+        See suppress_peaks()
+    M : int (default: 1)
+        The number of polyphase matched filters the `phases` passed to push() choose between,
+        which sets the sub-sample `offset` of each detection
+    """
+
+    def __init__(self, thresh, M=1):
+        self.thresh = thresh
+        self.M = M
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        # The length of a run of peaks that has yet to end, and the index (from the start of
+        # the run), value and phase of its maximum so far
+        self.run_len = 0
+        self.run_peak = 0
+        self.run_max = 0
+        self.run_phase = 0
+        self.num_samples = 0
+        self.dtype = float64
+
+    def run_start(self):
+        """
+        Return the index of the first sample of the run left open by push(), or of the sample
+        after the end of the stream so far if no run is open
+        """
+        return self.num_samples - self.run_len
+
+    def detections(self, index, value, run_length, phase):
+        """
+        Return an array of detections from arrays of their fields
+        """
+        out = zeros(len(index), dtype=detection_dtype(self.dtype))
+        out["index"] = index
+        out["value"] = value
+        out["run_length"] = run_length
+        out["phase"] = phase
+        out["offset"] = out["phase"] * 1.0 / self.M
+        return out
+
+    def push(self, x, phases=None):
+        """
+        Feed the next chunk of the stream in, along with the phase of the polyphase matched filter
+        behind every sample if known, returning the detections of the runs it ends
+        """
+        x = asarray(x)
+        phases = zeros(len(x), dtype=intp) if phases is None else asarray(phases)
+        base = self.num_samples
+        self.num_samples += len(x)
+        if len(x) == 0:
+            return self.detections([], [], [], [])
+        self.dtype = x.dtype
+        starts, stops = find_runs(abs(x) > self.thresh)
+        peaks = run_peaks(x, starts, stops)
+        values = x[peaks]
+        peak_phases = phases[peaks]
+
+        # The run left open by the last chunk ends here, unless this chunk continues it, in
+        # which case the peak of this chunk's first run challenges the open peak
+        run_len = self.run_len
+        if run_len:
+            if len(starts) and starts[0] == 0:
+                if not self.run_max >= values[0]:
+                    self.run_peak = run_len + peaks[0]
+                    self.run_max = values[0]
+                    self.run_phase = peak_phases[0]
+                self.run_len += stops[0]
+                starts, stops, peaks = starts[1:], stops[1:], peaks[1:]
+                values, peak_phases = values[1:], peak_phases[1:]
+            if self.run_len < run_len + len(x):
+                starts = concatenate(([-run_len], starts))
+                stops = concatenate(([self.run_len - run_len], stops))
+                peaks = concatenate(([self.run_peak - run_len], peaks))
+                values = concatenate(([self.run_max], values)).astype(x.dtype)
+                peak_phases = concatenate(([self.run_phase], peak_phases))
+                self.run_len = 0
+
+        # Hold back a run that reaches the end of this chunk until we know where it ends
+        if len(stops) and stops[-1] == len(x):
+            self.run_len = len(x) - starts[-1]
+            self.run_peak = peaks[-1] - starts[-1]
+            self.run_max = values[-1]
+            self.run_phase = peak_phases[-1]
+            starts, stops, peaks = starts[:-1], stops[:-1], peaks[:-1]
+            values, peak_phases = values[:-1], peak_phases[:-1]
+        return self.detections(base + peaks, values, stops - starts, peak_phases)
+
+    def flush(self):
+        """
+        End the stream fed in through push(), returning the detection of any run left open and
+        resetting the stream
+        """
+        if self.run_len:
+            out = self.detections([self.run_start() + self.run_peak], [self.run_max],
+                                  [self.run_len], [self.run_phase])
+        else:
+            out = self.detections([], [], [], [])
+        self.reset()
+        return out
+
+
+class PeakSuppressor:
+    """
+    Suppress neighboring, smaller peaks within a continuous stream, one chunk at a time.  Feed
+    chunks of any size into push(), which returns the peakstream of every sample up to the start
+    of any run of peaks still open at the end of the chunk, then call flush() once the stream has
+    ended to emit that run.  The peaks are found by a PeakDetector.
+
+    Constructor parameters
+    ----------------------
+    thresh : number
+        See suppress_peaks()
+    """
+
+    def __init__(self, thresh):
+        self.detector = PeakDetector(thresh)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.detector.reset()
+        self.num_emitted = 0
+
+    def peakstream(self, detections, stop):
+        """
+        Return the peakstream from the last sample emitted up to sample `stop`, zero but for the
+        peaks of `detections`
+        """
+        out = zeros(stop - self.num_emitted, dtype=detections.dtype["value"])
+        out[detections["index"] - self.num_emitted] = detections["value"]
+        self.num_emitted = stop
+        return out
+
+    def push(self, x):
+        """
+        Feed the next chunk of the stream in, returning the peakstream it completes
+        """
+        detections = self.detector.push(x)
+        return self.peakstream(detections, self.detector.run_start())
+
+    def flush(self):
+        """
+        End the stream fed in through push(), returning any run of peaks left open and resetting
+        the stream
+        """
+        stop = self.detector.num_samples
+        out = self.peakstream(self.detector.flush(), stop)
+        self.reset()
+        return out
+
+
+class DetectingStream:
+    """
+    Detect the peaks in the output of a streaming object (such as `MatchedFilter`), so that only
+    detections (see detection_dtype()) are returned from push() and flush().  Outputs with `value`
+    and `phase` fields, as returned by `SubsampleMatchedFilter` with `return_phase` set, are
+    detected along with their phase.
+
+    Constructor parameters
+    ----------------------
+    stream : object
+        The streaming object whose outputs to detect peaks in
+    thresh, M :
+        See PeakDetector
+    """
+
+    def __init__(self, stream, thresh, M=1):
+        self.stream = stream
+        self.detector = PeakDetector(thresh, M)
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.stream.reset()
+        self.detector.reset()
+
+    def detect(self, outputs):
+        if outputs.dtype.names:
+            return self.detector.push(outputs["value"], outputs["phase"])
+        return self.detector.push(outputs)
+
+    def push(self, x):
+        """
+        Feed the next chunk of the stream in, returning the detections it completes
+        """
+        return self.detect(self.stream.push(x))
+
+    def flush(self):
+        """
+        End the stream fed in through push(), returning any detections left and resetting the
+        stream
+        """
+        out = concatenate((self.detect(self.stream.flush()), self.detector.flush()))
+        self.reset()
+        return out
@@ -1,36 +1,55 @@
 from numpy import *
-from ..util import RollingBuffer, make_gen
+from ..util import unchunk, stream_chunks
+from .rolling_stats import RollingStatistic
 
 
-def rolling_abs_mean(data, N, mode="same"):
+def rolling_abs_mean(data, N, mode="same", chunk_size=4096):
     """
     Calculate the mean of the absolute value of a sliding window of length N
 
     Parameters
     ----------
     data : 1-D signal (array or iterator)
-    The actual timeseries to operate on.  This should be an iterator, so
-    if you have a numpy array called x, pass in nditer(x) to this function
+    The actual timeseries to operate on.  This can be an array or an iterator
     N : integer
             The length of the sliding window, in samples
     mode : string
     Similar to numpy.convolve(); output length should be "same" or "valid" to disable/enable
     chomping of output that is due to transient response at the beginning/end of a stream.
     Note that since this function assumes an infinite stream, it only bothers with the beginning
+    chunk_size : integer
+            Number of samples of array `data` to process at once (default 4096)
 
     Yielded values
     --------------
     mean : float
             The mean of the window at its current shift in the data stream
     """
-    data = make_gen(data)
+    return unchunk(rolling_abs_mean_chunks(data, N, mode, chunk_size))
 
-    rb = RollingBuffer(N, dtype=float64)
-    # Pre-load so that we're operating in "valid" mode
-    for idx in range(N - 1):
-        rb.push(abs(next(data)))
 
-    # Now, give them the mean!
-    for x in data:
-        rb.push(abs(x))
-        yield mean(rb.buff)
+def rolling_abs_mean_chunks(data, N, mode="same", chunk_size=4096):
+    """
+    Calculate the mean of the absolute value of a sliding window of length N, one chunk at a time:
+    like rolling_abs_mean(), but yielding an array of means for every chunk of `data` that
+    completes at least one window.  `data` may also be an iterator of arrays.
+    """
+    return stream_chunks(RollingAbsMean(N, mode), data, chunk_size)
+
+
+class RollingAbsMean(RollingStatistic):
+    """
+    Calculate the mean of the absolute value of a sliding window over a continuous stream, one chunk
+    at a time.  Feed chunks of any size into push(), which returns the mean of every window that
+    chunk completes.  Only the last N samples are held onto between chunks, see RollingStatistic.
+
+    Constructor parameters
+    ----------------------
+    N, mode :
+        See rolling_abs_mean()
+    renorm_interval :
+        See RollingStatistic
+    """
+
+    def __init__(self, N, mode="same", renorm_interval=4096):
+        RollingStatistic.__init__(self, N, "abs_mean", renorm_interval)
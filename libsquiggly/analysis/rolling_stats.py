@@ -0,0 +1,253 @@
+from numpy import *
+from numpy import sqrt
+from ..util import unchunk, stream_chunks
+
+# Rolling statistics are calculated from running sums of the first and second moments of
+# the samples within the window, updated by the samples entering and leaving it, so that
+# each output costs O(1) however long the window is.  Summing differences accumulates
+# rounding error though, so every `renorm_interval` samples the running sums are
+# recalculated exactly from the samples within the window.  The mean and variance are
+# summed about a reference level, re-picked from the window at every recalculation,
+# lest the sums of a signal with a large DC offset cancel each other out.
+rolling_stats = ["mean", "abs_mean", "rms", "variance"]
+
+
+def check_stat(stat):
+    if not stat in rolling_stats:
+        raise ValueError("Unrecognized `stat` value: " + stat)
+
+
+def stat_moments(stat, x, ref=0):
+    """
+    Return the first moment (the samples of `x`, or their absolute value for "abs_mean")
+    and the second moment (the squared magnitude of `x`) that `stat` is calculated from,
+    using None for those it does not need.  The samples are taken relative to `ref` for
+    the "mean" and "variance", which do not otherwise change when `x` is offset.
+    """
+    s1 = None
+    s2 = None
+    if stat in ["mean", "variance"]:
+        x = x - ref
+    if stat == "abs_mean":
+        s1 = abs(x)
+    elif stat in ["mean", "variance"]:
+        s1 = x
+    if stat in ["rms", "variance"]:
+        s2 = x.real * x.real + x.imag * x.imag if iscomplexobj(x) else x * x
+    return s1, s2
+
+
+def moments_to_stat(stat, s1, s2, N, ref=0):
+    """
+    Turn the window sums of the moments returned by stat_moments() about `ref` into the
+    statistic `stat` of windows of length N
+    """
+    if stat == "mean":
+        return ref + s1 / N
+    if stat == "abs_mean":
+        return s1 / N
+    # Rounding can leave the mean square a hair below zero, or below the squared mean
+    if stat == "rms":
+        return sqrt(maximum(s2 / N, 0))
+    m1 = s1 / N
+    return maximum(s2 / N - (m1.real * m1.real + m1.imag * m1.imag if iscomplexobj(m1) else m1 * m1), 0)
+
+
+def window_sums(s, N):
+    """
+    Return the sums of every complete window of length N within the moment array `s` as the
+    difference of cumulative sums (None where `s` is None)
+    """
+    if s is None:
+        return None
+    c = cumsum(s)
+    out = c[N - 1:].copy()
+    out[1:] -= c[:len(c) - N]
+    return out
+
+
+def rolling_stat_array(x, N, stat="mean", renorm_interval=4096):
+    """
+    Calculate a statistic of every complete sliding window of length N over the array `x`
+    at once, from cumulative sums of the moments of `x`
+
+    Parameters
+    ----------
+    x : 1-D signal array
+    N : integer
+            The length of the sliding window, in samples
+    stat : string
+            The statistic to calculate over each window.  One of:
+            * "mean": the mean of the (possibly complex) samples (default)
+            * "abs_mean": the mean of the absolute value of the samples
+            * "rms": the root mean square of the magnitude of the samples
+            * "variance": the variance of the samples, the mean square of their magnitude
+                less the squared magnitude of their mean
+    renorm_interval : integer
+            Number of windows to sum from one cumulative sum (default 4096), bounding
+            the rounding error that accumulates along it.  Each cumulative sum is taken
+            about the mean of the samples it covers.
+
+    Return values
+    -------------
+    out : 1-D array
+            The `len(x) - N + 1` statistics of every complete window of `x`
+    """
+    check_stat(stat)
+    x = asarray(x)
+    block_size = max(renorm_interval, 1)
+    outputs = []
+    for idx in range(0, len(x) - N + 1, block_size):
+        x_block = x[idx:idx + block_size + N - 1]
+        ref = mean(x_block)
+        s1, s2 = stat_moments(stat, x_block, ref)
+        outputs += [moments_to_stat(stat, window_sums(s1, N), window_sums(s2, N), N, ref)]
+    return concatenate(outputs) if outputs else zeros(0)
+
+
+def rolling_stat(data, N, stat="mean", chunk_size=4096):
+    """
+    Calculate a statistic of a sliding window of length N over a datastream
+
+    Parameters
+    ----------
+    data : 1-D signal (array or iterator)
+    The actual timeseries to operate on.  This can be an array or an iterator
+    N : integer
+            The length of the sliding window, in samples
+    stat : string
+            The statistic to calculate over each window, see rolling_stat_array()
+    chunk_size : integer
+            Number of samples of array `data` to process at once (default 4096)
+
+    Yielded values
+    --------------
+    stat : float
+            The statistic of the window at its current shift in the data stream
+    """
+    return unchunk(rolling_stat_chunks(data, N, stat, chunk_size))
+
+
+def rolling_stat_chunks(data, N, stat="mean", chunk_size=4096):
+    """
+    Calculate a statistic of a sliding window of length N, one chunk at a time: like
+    rolling_stat(), but yielding an array of statistics for every chunk of `data` that
+    completes at least one window.  `data` may also be an iterator of arrays.
+    """
+    return stream_chunks(RollingStatistic(N, stat), data, chunk_size)
+
+
+class RollingStatistic:
+    """
+    Calculate a statistic of a sliding window over a continuous stream, one chunk at a time.
+    Feed chunks of any size into push(), which returns the statistic of every window that chunk
+    completes.  The last N samples are held onto in a ring buffer between chunks, alongside the
+    running sums of their moments, so that each push costs time in proportion to the length of
+    its chunk alone.
+
+    Constructor parameters
+    ----------------------
+    N, stat :
+        See rolling_stat()
+    renorm_interval : integer (default: 4096)
+        Number of samples between exact recalculations of the running sums, at a cost of O(N)
+        each.  Intervals shorter than N are lengthened to N.
+    """
+
+    def __init__(self, N, stat="mean", renorm_interval=4096):
+        check_stat(stat)
+        self.N = N
+        self.stat = stat
+        self.renorm_interval = max(renorm_interval, N)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.ring = zeros(self.N)
+        self.ring_idx = 0
+        self.num_samples = 0
+        self.renorm()
+
+    def renorm(self):
+        """
+        Recalculate the running sums of the moments of the samples in the window exactly,
+        about the mean of the window
+        """
+        self.ref = mean(self.ring)
+        s1, s2 = stat_moments(self.stat, self.ring, self.ref)
+        self.s1 = None if s1 is None else sum(s1)
+        self.s2 = None if s2 is None else sum(s2)
+        self.since_renorm = 0
+
+    def push(self, x):
+        """
+        Feed the next chunk of the stream in, returning an array of the statistics of the windows
+        it completes
+        """
+        x = asarray(x)
+        if iscomplexobj(x) and not iscomplexobj(self.ring):
+            self.ring = self.ring.astype(result_type(self.ring, x))
+            self.renorm()
+        if self.num_samples == 0 and len(x):
+            # Windows reaching back before the start of the stream are never output, so
+            # fill the ring with the first sample to centre the sums on the stream from
+            # the start
+            self.ring[:] = x[0]
+            self.renorm()
+
+        outputs = []
+        idx = 0
+        while idx < len(x):
+            # Split the chunk wherever the running sums are due to be renormalized
+            idx_stop = min(idx + self.renorm_interval - self.since_renorm, len(x))
+            outputs += [self.push_block(x[idx:idx_stop])]
+            self.since_renorm += idx_stop - idx
+            if self.since_renorm >= self.renorm_interval:
+                self.renorm()
+            idx = idx_stop
+
+        out = concatenate(outputs) if outputs else zeros(0)
+        # Windows that started before the stream did are incomplete
+        skip = max(self.N - 1 - (self.num_samples - len(x)), 0)
+        return out[skip:]
+
+    def push_block(self, x):
+        """
+        Slide the window over every sample of `x`, returning the statistic of each window and
+        updating the ring buffer and running sums
+        """
+        n = len(x)
+        N = self.N
+
+        # The sample leaving the window as each sample of x enters it comes from the ring
+        # buffer for the first N samples of x, and from x itself afterwards
+        leaving = empty(n, dtype=result_type(self.ring, x))
+        ring_n = min(n, N)
+        ring_idxs = (self.ring_idx + arange(ring_n)) % N
+        leaving[:ring_n] = self.ring[ring_idxs]
+        leaving[ring_n:] = x[:n - ring_n]
+
+        # Only the last N samples of x are still within the window afterwards
+        self.ring[(self.ring_idx + arange(n - ring_n, n)) % N] = x[n - ring_n:]
+        self.ring_idx = (self.ring_idx + n) % N
+        self.num_samples += n
+
+        x_s1, x_s2 = stat_moments(self.stat, x, self.ref)
+        leaving_s1, leaving_s2 = stat_moments(self.stat, leaving, self.ref)
+        s1 = s2 = None
+        if x_s1 is not None:
+            s1 = self.s1 + cumsum(x_s1 - leaving_s1)
+            self.s1 = s1[-1]
+        if x_s2 is not None:
+            s2 = self.s2 + cumsum(x_s2 - leaving_s2)
+            self.s2 = s2[-1]
+        return moments_to_stat(self.stat, s1, s2, N, self.ref)
+
+    def flush(self):
+        """
+        End the stream fed in through push(), resetting it
+        """
+        self.reset()
+        return zeros(0)
@@ -1,5 +1,5 @@
 # Only export very specific items
-from .lpc import lpc_freq, lpc_freqtrack
+from .lpc import lpc_freq, lpc_freqtrack, lpc_freqtrack_stream, SlidingAutocorrelation, LPCTracker
 from .lsharm import lsharm_freqtrack
 from .peaktracing import quadratic_peak_interpolation, windowed_peaktracing, guided_peaktracing
 from .maxpeak import max_peak
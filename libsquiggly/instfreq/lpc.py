@@ -1,9 +1,242 @@
 from numpy import *
 from scipy import *
+from numpy import sqrt
+from numpy.lib.stride_tricks import as_strided
 from .talkbox import lpc
+from .talkbox.linpred.levinson_lpc import acorr_lpc, levinson
+from ..util import make_chunks
 
 
-def lpc_freq(x, order=2, fs=2.0):
+def framed_autocorrelation(x, maxlag, win_len=128, step=1, block_size=1024):
+    """
+    Calculate the biased autocorrelation (divided by `win_len`) at lags 0 through
+    `maxlag` of every full window `x[i*step:i*step + win_len]` of a real signal, as
+    `lpc()` does for a single window.  Small lags with small steps are calculated as
+    sliding sums of the lagged products of `x`, and anything else by a batched FFT
+    over the (zero-copy) windows.
+
+    Parameters
+    ----------
+    x : 1-D signal array
+            Preferrably a numpy array
+    maxlag : int
+            The largest lag to calculate
+    win_len : int
+            Length of each window (default 128)
+    step : int
+            Number of samples to step between windows (default 1)
+    block_size : int
+            Number of windows to calculate at once (default 1024).  Sliding sums
+            restart with every block, bounding the rounding error they accumulate.
+
+    Returns
+    -------
+    r : 2-D array
+            The `(nframes, maxlag + 1)` autocorrelations of every window
+    """
+    if not isrealobj(x):
+        raise ValueError("Complex input not supported yet")
+    if maxlag > win_len:
+        raise ValueError("Input signal must have length >= order")
+
+    x = ascontiguousarray(x, dtype=float64)
+    nframes = max((len(x) - win_len) // step + 1, 0)
+    r = zeros((nframes, maxlag + 1))
+
+    # Each window costs `step` new products per lag with sliding sums
+    if (maxlag + 1) * step > win_len:
+        frames = as_strided(x, (nframes, win_len), (step * x.strides[0], x.strides[0]))
+        for idx in range(0, nframes, block_size):
+            idx_stop = min(idx + block_size, nframes)
+            r[idx:idx_stop] = acorr_lpc(frames[idx:idx_stop])[:, :maxlag + 1]
+        return r
+
+    for idx in range(0, nframes, block_size):
+        idx_stop = min(idx + block_size, nframes)
+        seg = x[idx * step:(idx_stop - 1) * step + win_len]
+        starts = arange(idx_stop - idx) * step
+        for k in range(maxlag + 1):
+            # Every window sums the products of lag k that lie entirely within it
+            c = concatenate(([0], cumsum(seg[:len(seg) - k] * seg[k:])))
+            r[idx:idx_stop, k] = c[starts + win_len - k] - c[starts]
+    r /= win_len
+    return r
+
+
+def lpc_frames(x, order=2, win_len=128, step=1, block_size=1024):
+    """
+    Calculate the linear predictive coding model of every full window
+    `x[i*step:i*step + win_len]` of a real signal at once, equivalent to calling
+    `lpc()` on each window in turn.  The autocorrelations of every window are
+    calculated by `framed_autocorrelation()`, and a single Levinson-Durbin recursion
+    call solves them all.
+
+    Parameters
+    ----------
+    x : 1-D signal array
+            Preferrably a numpy array
+    order : int
+            Order of linear model (default 2)
+    win_len, step, block_size :
+            See `framed_autocorrelation()`
+
+    Returns
+    -------
+    A : 2-D array
+            The `(nframes, order + 1)` LPC coefficients of every window
+    err : 1-D array
+            The prediction error of every window
+    k : 2-D array
+            The reflection coefficients of every window
+    """
+    r = framed_autocorrelation(x, order, win_len, step, block_size)
+    if len(r) == 0:
+        return zeros((0, order + 1)), zeros(0), zeros((0, order))
+    return levinson(r, order)
+
+
+def quadratic_pole_angles(A):
+    """
+    Return the angle of the root with the largest magnitude of every row of order-2
+    (or order-1) LPC coefficients `A`, in closed form.  Complex conjugate roots share
+    their magnitude, and the root with the positive angle is taken, as `roots()` does.
+    """
+    a1 = A[:, 1] / A[:, 0]
+    if A.shape[1] == 2:
+        # The single root is -a1
+        return where(a1 > 0, pi, 0.0)
+    a2 = A[:, 2] / A[:, 0]
+    disc = a1 * a1 - 4 * a2
+
+    # Real roots lie at angles of 0 or pi, and the larger of them shares the sign of -a1.
+    # Should they only differ in sign, roots() lists the negative root first.
+    angles = where((a1 > 0) | ((a1 == 0) & (a2 < 0)), pi, 0.0)
+    complex_roots = disc < 0
+    angles[complex_roots] = arctan2(sqrt(-disc[complex_roots]), -a1[complex_roots])
+    return angles
+
+
+def polynomial_roots(A, tol=1e-10, maxiter=100):
+    """
+    Return the `(nmodels, order)` roots of every row of polynomial coefficients `A`
+    (highest power first, as for `roots()`), found for every model at once by the
+    Aberth-Ehrlich iteration, a refinement of the Durand-Kerner iteration that
+    converges cubically to simple roots.  Models still unconverged after `maxiter`
+    iterations (e.g. those with repeated roots) are solved by `linalg.eigvals()`.
+    """
+    c = A[:, 1:] / A[:, :1]
+    nmodels, order = c.shape
+
+    # Start evenly spaced around a circle with the geometric mean magnitude of the
+    # roots, rotated off the real axis so as not to start on a conjugate pair
+    radius = abs(c[:, -1]) ** (1.0 / order)
+    radius[radius == 0] = 1
+    z = radius[:, newaxis] * exp(2j * pi * (arange(order) + .25) / order)
+
+    # Differences between every pair of roots are taken (and their reciprocals summed
+    # back onto each root) by multiplying with this incidence matrix
+    first, second = triu_indices(order, 1)
+    pairs = zeros((order, len(first)))
+    pairs[first, arange(len(first))] = 1
+    pairs[second, arange(len(first))] = -1
+
+    # Models with every coefficient zero have every root at zero, which the iteration
+    # would only crawl towards
+    zero = all(c == 0, axis=1)
+    z[zero] = 0
+    active = flatnonzero(~zero)
+    z_active, c_active = z[active], c[active]
+    with errstate(divide="ignore", invalid="ignore"):
+        for iteration in range(maxiter):
+            # Evaluate the polynomial and its derivative by Horner's scheme
+            p = ones(z_active.shape, dtype=complex128)
+            dp = zeros(z_active.shape, dtype=complex128)
+            for k in range(order):
+                dp *= z_active
+                dp += p
+                p *= z_active
+                p += c_active[:, k:k + 1]
+            newton = p / dp
+
+            # Every root repels every other root's estimate
+            repulsion = dot(1 / dot(z_active, pairs), pairs.T)
+            step = newton / (1 - newton * repulsion)
+            z_active = z_active - step
+
+            converged = all(abs(step) <= tol * maximum(abs(z_active), 1), axis=1)
+            if all(converged):
+                z[active] = z_active
+                return z
+            # Only drop converged models once enough of them are, saving the copies
+            if mean(converged) > .25:
+                z[active] = z_active
+                active = active[~converged]
+                z_active, c_active = z_active[~converged], c_active[~converged]
+
+    companion = zeros((len(active), order, order))
+    companion[:, 0, :] = -c[active]
+    companion[:, arange(1, order), arange(order - 1)] = 1
+    z[active] = linalg.eigvals(companion)
+    return z
+
+
+def lpc_pole_freqs(A, fs=2.0, method="auto"):
+    """
+    Return the frequency of the pole with the largest magnitude of every row of LPC
+    coefficients `A`, as `lpc_freq()` does for a single model.  Models that are not
+    finite, such as those of silent windows, are given a frequency of NaN.
+
+    Parameters
+    ----------
+    A : 2-D array
+            The `(nmodels, order + 1)` LPC coefficients of every model
+    fs : float
+            Sampling rate in Hz (default 2.0)
+    method : string
+            How to find the poles.  One of:
+            * "auto": "closed" for models of order 2 or less, "aberth" otherwise (default)
+            * "closed": solve the quadratic of every model in closed form
+            * "aberth": iterate towards the poles of every model at once, see
+                `polynomial_roots()`
+            * "eig": find the poles of every model as the eigenvalues of a stack of
+                companion matrices, which is how `roots()` finds them.  Though stacked,
+                LAPACK still solves one matrix at a time, so this is no faster than
+                calling `roots()` on every model.
+    """
+    if not method in ["auto", "closed", "aberth", "eig"]:
+        raise ValueError("Unrecognized `method` value: " + method)
+    A = atleast_2d(A)
+    order = A.shape[1] - 1
+    if method == "auto":
+        method = "closed" if order <= 2 else "aberth"
+    if method == "closed" and order > 2:
+        raise ValueError("Closed-form poles are only calculated up to order 2, not %d" % order)
+
+    freqs = full(len(A), nan)
+    valid = all(isfinite(A), axis=1) & (A[:, 0] != 0)
+    if order < 1 or not any(valid):
+        return freqs
+
+    if method == "closed":
+        freqs[valid] = quadratic_pole_angles(A[valid]) * fs / (2 * pi)
+        return freqs
+
+    if method == "aberth":
+        R = polynomial_roots(A[valid])
+    else:
+        companion = zeros((count_nonzero(valid), order, order))
+        companion[:, 0, :] = -A[valid, 1:] / A[valid, :1]
+        companion[:, arange(1, order), arange(order - 1)] = 1
+        R = linalg.eigvals(companion)
+    R = R[arange(len(R)), argmax(abs(R), axis=1)]
+    # A root at -0 would otherwise be given an angle of pi.  The roots of real models
+    # come in conjugate pairs of the same magnitude, of which `roots()` lists the one
+    # with the positive angle first.
+    freqs[valid] = abs(angle(R + 0)) * fs / (2 * pi)
+    return freqs
+
+
+def lpc_freq(x, order=2, fs=2.0, method="auto"):
     """
     Analyze a signal using linear predictive coding to discover the linear
     relationships between samples in the signal.  Use this linear model to
@@ -18,6 +251,8 @@ def lpc_freq(x, order=2, fs=2.0):
             Order of linear model (default 2)
     fs : float
             Sampling rate in Hz (default 2.0)
+    method : string
+            How to find the poles of the model, see `lpc_pole_freqs()`
 
     Returns
     -------
@@ -30,15 +265,12 @@ def lpc_freq(x, order=2, fs=2.0):
     # Ask talkbox to do the heavy lifting for us
     A, lpc_error, k = lpc(x, order)
 
-    # Find the roots of the returned polynomial
-    R = roots(A)
-
-    # Calculate angle of the strongest peak, convert to Hz
-    lpc_freq = angle(R[argmax(abs(R))]) * fs / (2 * pi)
+    # Calculate angle of the strongest root of the returned polynomial, convert to Hz
+    lpc_freq = lpc_pole_freqs(A, fs, method)[0]
     return lpc_freq, 1.0 / lpc_error
 
 
-def lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0):
+def lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0, method="auto"):
     """
     Analyze a signal using linear predictive coding to discover the linear
     relationships between samples in windows of the signal. Use this linear model
@@ -58,6 +290,8 @@ def lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0):
             Number of samples to step between windows (default 1)
     fs : float
             Sampling rate in Hz (default 2.0)
+    method : string
+            How to find the poles of each model, see `lpc_pole_freqs()`
 
     Returns
     -------
@@ -67,8 +301,6 @@ def lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0):
             The instantaneous residual error
     """
 
-    nlen = int(ceil((len(x) - 1.0 * win_len) / step))
-
     lpc_estimates = zeros(len(x) // step)
     lpc_error = zeros(len(x) // step)
 
@@ -76,11 +308,334 @@ def lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0):
     pad_len = win_len // step
     x = hstack((zeros(pad_len // 2), x, zeros(pad_len // 2)))
 
-    for i in range((len(x) - pad_len) // step):
+    # Every full window is modeled in one batch
+    nlen = (len(x) - pad_len) // step
+    A, err, k = lpc_frames(x, order, win_len, step)
+    nfull = min(len(A), nlen)
+    lpc_estimates[:nfull] = lpc_pole_freqs(A[:nfull], fs, method)
+    lpc_error[:nfull] = 1.0 / err[:nfull]
+
+    # The last windows can run off the end of the padding when `step` > 1
+    for i in range(nfull, nlen):
         window = x[i * step:i * step + win_len]
 
-        lpc_f, lpc_e = lpc_freq(window, order, fs)
+        lpc_f, lpc_e = lpc_freq(window, order, fs, method)
         lpc_estimates[i] = lpc_f
         lpc_error[i] = lpc_e
 
     return lpc_estimates, lpc_error
+
+
+def lpc_freqtrack_stream(data, order=2, win_len=128, fs=2.0, method="auto", chunk_size=4096,
+                         renorm_interval=4096):
+    """
+    Track the instantaneous frequency of a datastream with linear predictive coding,
+    like `lpc_freqtrack()` with a `step` of 1, modeling the window that ends at every
+    sample once `win_len` samples have arrived.  See `LPCTracker`, which this feeds
+    the stream through.
+
+    Parameters
+    ----------
+    data : 1-D signal (array or iterator)
+            The actual timeseries to track.  This can be an array, an iterator of samples
+            or an iterator of arrays of samples (see make_chunks() in libsquiggly.util)
+    order, win_len, fs, method :
+            See `lpc_freqtrack()`
+    chunk_size : int
+            Number of samples of array `data` to track at once (default 4096)
+    renorm_interval : int
+            See `SlidingAutocorrelation`
+
+    Yielded values
+    --------------
+    freq : float
+            The frequency estimate of the window ending at the current sample
+    err : float
+            The instantaneous residual error
+    """
+    tracker = LPCTracker(order, win_len, fs, method, renorm_interval, chunk_size)
+    for chunk in make_chunks(data, chunk_size):
+        freqs, errs = tracker.push(chunk)
+        for idx in range(len(freqs)):
+            yield freqs[idx], errs[idx]
+
+
+class SlidingAutocorrelation:
+    """
+    Calculate the biased autocorrelation (divided by `win_len`) at lags 0 through
+    `maxlag` of a sliding window over a continuous stream, one chunk at a time.  Feed
+    chunks of any size into push(), which returns the autocorrelation of the window
+    ending at every sample of the chunk, as though the stream were preceded by zeros.
+    Each lag is updated from the last window by adding the product entering the window
+    and removing the product leaving it, costing O(maxlag) per sample.  The lags are
+    recalculated exactly from the window every `renorm_interval` samples to bound the
+    rounding error the updates accumulate.
+
+    Only the last `win_len` samples are held onto between chunks, at the head of a
+    buffer that each chunk is copied in behind.  That buffer, and the one the
+    autocorrelations are returned in, are reused from chunk to chunk, growing only
+    to fit chunks longer than any before.
+
+    Constructor parameters
+    ----------------------
+    maxlag : int
+        The largest lag to calculate
+    win_len : int
+        Length of the sliding window (default 128)
+    renorm_interval : int
+        Number of samples between exact recalculations (default 4096), each costing
+        O(maxlag * win_len).  Intervals shorter than `win_len` are lengthened to it.
+    block_size : int
+        Length of chunk to allocate buffers for up front (default 4096)
+    """
+
+    def __init__(self, maxlag, win_len=128, renorm_interval=4096, block_size=4096):
+        if maxlag > win_len:
+            raise ValueError("Input signal must have length >= order")
+        self.maxlag = maxlag
+        self.win_len = win_len
+        self.renorm_interval = max(renorm_interval, win_len)
+        self.capacity = 0
+        self.reserve(block_size)
+        self.reset()
+
+    def reserve(self, n):
+        """
+        Make sure the buffers fit a chunk of `n` samples, keeping the window held onto
+        """
+        if n <= self.capacity:
+            return
+        history = self.buff[:self.win_len] if self.capacity else zeros(self.win_len)
+        self.capacity = n
+        self.buff = zeros(self.win_len + n)
+        self.buff[:self.win_len] = history
+        self.sums = empty((self.maxlag + 1, n))
+        self.delta = empty(n)
+        self.work = empty(n)
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.buff[:self.win_len] = 0
+        self.running = zeros(self.maxlag + 1)
+        self.since_renorm = 0
+
+    def renorm(self, start):
+        """
+        Recalculate the lag sums of the window `buff[start:start + win_len]` exactly
+        """
+        W = self.win_len
+        h = self.buff[start:start + W]
+        for k in range(self.maxlag + 1):
+            self.running[k] = dot(h[k:], h[:W - k])
+        self.since_renorm = 0
+
+    def push(self, x):
+        """
+        Feed the next chunk of the stream in, returning the `(len(x), maxlag + 1)`
+        autocorrelations of the windows ending at each of its samples.  This is a view
+        of a buffer that the next call to push() overwrites.
+        """
+        x = asarray(x)
+        if not isrealobj(x):
+            raise ValueError("Complex input not supported yet")
+        n = len(x)
+        W = self.win_len
+        self.reserve(n)
+        buff = self.buff
+        buff[W:W + n] = x
+
+        # The sample at index i of x lies at buff[W + i], so window i gains the products
+        # buff[W + i] buff[W + i - k] and loses buff[i + k] buff[i]
+        idx = 0
+        while idx < n:
+            # Split the chunk wherever the lags are due to be recalculated
+            idx_stop = min(idx + self.renorm_interval - self.since_renorm, n)
+            delta = self.delta[:idx_stop - idx]
+            work = self.work[:idx_stop - idx]
+            for k in range(self.maxlag + 1):
+                multiply(buff[W + idx:W + idx_stop], buff[W + idx - k:W + idx_stop - k], out=delta)
+                multiply(buff[idx + k:idx_stop + k], buff[idx:idx_stop], out=work)
+                delta -= work
+                sums = self.sums[k, idx:idx_stop]
+                cumsum(delta, out=sums)
+                sums += self.running[k]
+                self.running[k] = sums[-1]
+            self.since_renorm += idx_stop - idx
+            if self.since_renorm >= self.renorm_interval:
+                self.renorm(idx_stop)
+            idx = idx_stop
+
+        # Keep the last W samples at the head of the buffer for the next chunk
+        buff[:W] = buff[n:n + W]
+        r = self.sums[:, :n]
+        r *= 1.0 / W
+        return r.T
+
+
+class LPCTracker:
+    """
+    Track the instantaneous frequency of a continuous stream with linear predictive
+    coding, one chunk at a time, as `lpc_freqtrack()` does for a whole signal with a
+    `step` of 1.  Feed chunks of any size into push(), which returns the frequency and
+    inverse prediction error of the window ending at every sample of the chunk, once
+    `win_len` samples have arrived.  Windows are causal: each ends at the sample it is
+    estimated for, rather than being centered on it.
+
+    The autocorrelation of each window is updated from the last by a
+    `SlidingAutocorrelation`, holding onto only the last `win_len` samples, and every
+    window's model is solved by a Levinson-Durbin recursion vectorized across the
+    chunk, costing O(order^2) per sample.  All work is done within buffers reused from
+    chunk to chunk, so that tracking a live feed allocates nothing per chunk, save for
+    the iterative root-finding of the poles of models above order 2.
+
+    Constructor parameters
+    ----------------------
+    order, win_len, fs, method :
+        See `lpc_freqtrack()`
+    renorm_interval : int
+        See `SlidingAutocorrelation` (default 4096)
+    block_size : int
+        Length of chunk to allocate buffers for up front (default 4096).  Longer chunks
+        grow the buffers to fit them.
+    """
+
+    def __init__(self, order=2, win_len=128, fs=2.0, method="auto", renorm_interval=4096,
+                 block_size=4096):
+        if not method in ["auto", "closed", "aberth", "eig"]:
+            raise ValueError("Unrecognized `method` value: " + method)
+        if method == "closed" and order > 2:
+            raise ValueError("Closed-form poles are only calculated up to order 2, not %d" % order)
+        self.order = order
+        self.win_len = win_len
+        self.fs = fs
+        self.method = method
+        self.acorr = SlidingAutocorrelation(order, win_len, renorm_interval, block_size)
+        self.capacity = 0
+        self.reserve(block_size)
+        self.reset()
+
+    def reserve(self, n):
+        """
+        Make sure the buffers fit a chunk of `n` samples
+        """
+        if n <= self.capacity:
+            return
+        self.capacity = n
+        self.A = empty((self.order + 1, n))
+        self.A_prev = empty((self.order + 1, n))
+        self.err = empty(n)
+        self.k = empty(n)
+        self.work = empty(n)
+        self.mask = empty(n, dtype=bool)
+        self.tie = empty(n, dtype=bool)
+        self.freqs = empty(n)
+        self.inv_err = empty(n)
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        self.acorr.reset()
+        self.num_samples = 0
+
+    def levinson(self, r, n):
+        """
+        Run the Levinson-Durbin recursion of talkbox's `levinson()` over the
+        `(order + 1, n)` autocorrelations `r` of n windows at once, into `A` and `err`
+        """
+        A, A_prev = self.A[:, :n], self.A_prev[:, :n]
+        err, k, work = self.err[:n], self.k[:n], self.work[:n]
+        A[0] = 1
+        err[:] = r[0]
+        for i in range(1, self.order + 1):
+            k[:] = r[i]
+            for j in range(1, i):
+                multiply(A[j], r[i - j], out=work)
+                k += work
+            divide(k, err, out=k)
+            negative(k, out=k)
+
+            A_prev[:i] = A[:i]
+            A[i] = k
+            for j in range(1, i):
+                multiply(k, A_prev[i - j], out=work)
+                A[j] += work
+            multiply(k, k, out=work)
+            subtract(1, work, out=work)
+            err *= work
+
+    def pole_freqs(self, n):
+        """
+        Find the frequency of the strongest pole of the n models in `A`, into `freqs`,
+        as `lpc_pole_freqs()` does
+        """
+        freqs, work, mask = self.freqs[:n], self.work[:n], self.mask[:n]
+        if self.order < 1:
+            freqs[:] = nan
+            return
+        if self.order > 2 or self.method in ["aberth", "eig"]:
+            freqs[:] = lpc_pole_freqs(self.A[:, :n].T, self.fs, self.method)
+            return
+
+        # The closed form of quadratic_pole_angles(), with the real root taken to share
+        # the sign of -a1
+        a1 = self.A[1, :n]
+        greater(a1, 0, out=mask)
+        if self.order == 2:
+            a2 = self.A[2, :n]
+            k, tie = self.k[:n], self.tie[:n]
+            equal(a1, 0, out=tie)
+            less(a2, 0, out=mask)
+            logical_and(mask, tie, out=tie)
+            greater(a1, 0, out=mask)
+            logical_or(mask, tie, out=mask)
+        multiply(mask, pi, out=freqs)
+        if self.order == 2:
+            # Complex roots lie at the angle atan2(sqrt(-disc), -a1)
+            multiply(a1, a1, out=work)
+            multiply(a2, 4, out=k)
+            subtract(k, work, out=work)
+            greater(work, 0, out=mask)
+            sqrt(maximum(work, 0, out=work), out=work)
+            negative(a1, out=k)
+            arctan2(work, k, out=work)
+            copyto(freqs, work, where=mask)
+            isfinite(a2, out=mask)
+            logical_not(mask, out=mask)
+            copyto(freqs, nan, where=mask)
+        isfinite(a1, out=mask)
+        logical_not(mask, out=mask)
+        copyto(freqs, nan, where=mask)
+        freqs *= self.fs / (2 * pi)
+
+    def push(self, x):
+        """
+        Feed the next chunk of the stream in, returning arrays of the frequency estimates
+        and inverse prediction errors of the windows it completes.  These are views of
+        buffers that the next call to push() overwrites.
+        """
+        x = asarray(x)
+        if not isrealobj(x):
+            raise ValueError("Complex input not supported yet")
+        n = len(x)
+        self.reserve(n)
+        r = self.acorr.push(x).T
+
+        with errstate(divide="ignore", invalid="ignore"):
+            self.levinson(r, n)
+            self.pole_freqs(n)
+            divide(1, self.err[:n], out=self.inv_err[:n])
+
+        # Windows that started before the stream did are incomplete
+        skip = min(max(self.win_len - 1 - self.num_samples, 0), n)
+        self.num_samples += n
+        return self.freqs[skip:n], self.inv_err[skip:n]
+
+    def flush(self):
+        """
+        End the stream fed in through push(), resetting it
+        """
+        self.reset()
+        return zeros(0), zeros(0)
@@ -1,6 +1,88 @@
 from numpy import *
 from scipy import *
 from scipy.signal import *
+from numpy import sqrt
+from numpy.lib.stride_tricks import as_strided
+from ..tfr.cache import window_cache
+
+
+def goertzel_bank(freqs, weights, fs, win_len):
+    """
+    Build the Goertzel filterbank of every harmonic of every fundamental frequency in
+    `freqs` (see `lsharm_freqtrack()`) as a single matrix.  The phase-corrected last
+    output of a Goertzel filter tuned to `f` over a `win_len` window `x` is the DFT
+    coefficient `sum(x[m] * exp(-2j*pi*f/fs*m)) / sqrt(win_len)`, so each filter is
+    one row of the returned `(2, nfilters, win_len)` stack of the real and imaginary
+    parts of those exponentials.  Harmonics above nyquist are left out, and the
+    returned `(nfilters, len(freqs))` mask matrix sums the squared weight of every
+    remaining harmonic into the power of its fundamental.  Both are cached in
+    `window_cache`, so that tracking many signals with the same parameters builds
+    them only once.
+    """
+    def build():
+        f0 = asarray(freqs, dtype=float64)
+        K = len(weights)
+        harmonics = arange(1, K + 1)
+
+        # Harmonic k of f0 is kept while k < fs / (2 * f0), as nyquist allows
+        max_order = (fs / (2 * f0)).astype(int)
+        f_idxs, k_idxs = nonzero(arange(K)[newaxis, :] < max_order[:, newaxis])
+
+        phases = -2 * pi * (harmonics[k_idxs] * f0[f_idxs] / fs)[:, newaxis] * arange(win_len)
+        bank = array([cos(phases), sin(phases)]) / sqrt(win_len)
+        mask = zeros((len(f_idxs), len(f0)))
+        mask[arange(len(f_idxs)), f_idxs] = asarray(weights, dtype=float64)[k_idxs]**2
+        bank.flags.writeable = False
+        mask.flags.writeable = False
+        return bank, mask
+    key = (win_len, float64, "goertzel", tuple(freqs), tuple(weights), fs)
+    return window_cache.get(key, build)
+
+
+def lsharm_power(x, freqs, weights=[1, .5, .5], fs=2.0, win_len=100, skip=1, block_size=1024):
+    """
+    Calculate the weighted harmonic power of every fundamental frequency in `freqs`
+    within the window about every `skip`-th sample of `x`, as `lsharm_freqtrack()`
+    searches over.  The windows are framed without copying and multiplied by the
+    whole Goertzel filterbank of `goertzel_bank()` at once, a block of windows at a
+    time.
+
+    Parameters
+    ----------
+    x : 1-D signal array
+            The data to be analyzed
+    freqs, weights, fs, win_len, skip :
+            See `lsharm_freqtrack()`
+    block_size : int
+            Number of windows to filter at once (default 1024)
+
+    Returns
+    -------
+    P : 2-D array
+            The `(len(x) // skip, len(freqs))` power of every fundamental frequency
+            within every window
+    """
+    bank, mask = goertzel_bank(freqs, weights, fs, win_len)
+
+    # Zero-pad x so that we can actually perform the Goertzel-filtering at
+    # every point.  The window about x[idx] in the original non-padded signal
+    # starts at x[idx * skip] in the padded signal.
+    datalen = len(x)
+    nlen = datalen // skip
+    x = hstack((zeros(win_len // 2), x, zeros(win_len - win_len // 2)))
+    frames = as_strided(x, (nlen, win_len), (skip * x.strides[0], x.strides[0]))
+
+    P = zeros((nlen, len(freqs)))
+    for idx in range(0, nlen, block_size):
+        idx_stop = min(idx + block_size, nlen)
+        block = frames[idx:idx_stop]
+        if iscomplexobj(block):
+            C = dot(block, (bank[0] + 1j * bank[1]).T)
+            C = C.real**2 + C.imag**2
+        else:
+            C = dot(block, bank[0].T)**2 + dot(block, bank[1].T)**2
+        P[idx:idx_stop] = dot(C, mask)
+    return P
 
 
 def lsharm_freqtrack(x, freqs=None, weights=[1, .5, .5], fs=2.0, win_len=100, skip=1):
@@ -12,7 +94,8 @@ def lsharm_freqtrack(x, freqs=None, weights=[1, .5, .5], fs=2.0, win_len=100, sk
     integer multiples of that fundamental frequency.  Spectral energy is
     calculated about each timepoint by applying Goertzel filters to the
     neighborhood of the time instant under scrutiny. The length of signal
-    analyzed for frequency content is governed by `win_len`.
+    analyzed for frequency content is governed by `win_len`.  Every Goertzel
+    filter of every window is applied at once, see `lsharm_power()`.
 
     Parameters
     ----------
@@ -48,52 +131,9 @@ def lsharm_freqtrack(x, freqs=None, weights=[1, .5, .5], fs=2.0, win_len=100, sk
     if freqs is None:
         freqs = linspace(.5 * fs / len(weights), fs / len(weights), 100)
 
-    # Build Goertzel filterbanks, excluding any filters that exceed nyquist
-    fundamental_filters = {}
-    for f0 in freqs:
-        filterbank = []
-        max_order = min(len(weights), int(fs / (2 * f0)))
-        for k in range(max_order):
-            b = weights[k] * array([1, -exp(-2j * pi * (k + 1) * f0 / fs)])
-            a = weights[k] * \
-                array([1, -2 * cos(2 * pi * (k + 1) * f0 / fs), 1])
-            filterbank += [(b, a)]
-        fundamental_filters[f0] = filterbank
-
-    # Zero-pad x so that we can actually perform the Goertzel-filtering at
-    # every point
-    datalen = len(x)
-    x = hstack((zeros(win_len // 2), x, zeros(win_len // 2)))
-    lsharm_estimate = zeros(datalen // skip)
-
-    for idx in range(datalen // skip):
-        # Grab the window of data centered about x[idx] in the original
-        # non-padded signal
-        window = x[idx * skip:idx * skip + win_len]
-
-        # Calculate total power of each fundamental frequency, as well as error
-        P = zeros(len(freqs))
-
-        # For each fundamental frequency, apply Goertzel filters to data:
-        for f_idx in range(len(freqs)):
-            f0 = freqs[f_idx]
-            filterbank = fundamental_filters[f0]
-            C = zeros(len(filterbank), dtype=complex)
-
-            for k in range(len(filterbank)):
-                # Filter with Goertzel filter
-                temp = lfilter(filterbank[k][0], filterbank[k][1], window)
-
-                # Phase-correct last element of Goertzel filter and square it
-                # away in C
-                C[k] = exp(-2j * pi * (k + 1) * f0 / fs *
-                           (win_len - 1)) * temp[-1] / sqrt(win_len)
-
-            # Store total power of this fundamental frequency
-            P[f_idx] = sqrt(real(vdot(C, C)))
-
-        # Save highest frequency estimate into lsharm_estimage
-        lsharm_estimate[idx] = freqs[argmax(P)]
+    # Save highest frequency estimate of each window
+    P = lsharm_power(x, freqs, weights, fs, win_len, skip)
+    lsharm_estimate = asarray(freqs)[argmax(P, axis=1)]
 
     # Return the goods, after upsampling them
-    return resample(lsharm_estimate, datalen)
+    return resample(lsharm_estimate, len(x))
@@ -3,7 +3,7 @@
 # Last Change: Wed Sep 24 06:00 PM 2008 J
 
 import numpy as np
-from scipy.fftpack import fft, ifft
+from numpy.fft import rfft, irfft
 
 from ..tools import nextpow2
 
@@ -52,7 +52,7 @@ def lpc(signal, order, axis=-1):
     return levinson(r, order, axis)
 
 def _acorr_last_axis(x, nfft, maxlag):
-    a = np.real(ifft(np.abs(fft(x, n=nfft) ** 2)))
+    a = irfft(np.abs(rfft(x, nfft)) ** 2, nfft)
     return a[..., :maxlag+1] / x.shape[-1]
 
 def acorr_lpc(x, axis=-1):
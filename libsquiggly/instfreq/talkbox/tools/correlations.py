@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.fftpack import fft, ifft
+from numpy.fft import rfft, irfft
 
 __all__ = ['nextpow2', 'acorr']
 
@@ -31,7 +31,8 @@ def nextpow2(n):
         return res
 
 def _acorr_last_axis(x, nfft, maxlag, onesided=False, scale='none'):
-    a = np.real(ifft(np.abs(fft(x, n=nfft) ** 2)))
+    # x is real, so only the positive half of its spectrum is needed
+    a = irfft(np.abs(rfft(x, nfft)) ** 2, nfft)
     if onesided:
         b = a[..., :maxlag]
     else:
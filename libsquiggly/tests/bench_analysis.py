@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+from numpy import *
+from scipy import *
+from libsquiggly.analysis import *
+from libsquiggly.util import *
+from utils import *
+from libsquiggly.resampling import sinc_fractional_shift
+from bench_tfr import time_call
+
+
+def do_matched_filter_bench(N=20000, h_len=11):
+    x = randn(N) + 1j * randn(N)
+    h = sign(randn(h_len))
+
+    for step in [1, 8]:
+        t_ref = time_call(reference_matched_filter, x, h, step)
+        t_arr = time_call(matched_filter_array, x, h, step)
+        t_gen = time_call(lambda: acollect(matched_filter(x, h, step)))
+        print("matched_filter (N=%d, len(h)=%d, step=%d): per-sample %.0f samples/s, array %.0f samples/s (%.0fx), "
+              "chunked generator %.0f samples/s" % (N, h_len, step, N / t_ref, N / t_arr, t_ref / t_arr, N / t_gen))
+
+
+def do_subsample_matched_filter_bench(N=20000, h_len=11, M=5):
+    x = randn(N) + 1j * randn(N)
+    h = sign(randn(h_len))
+
+    def per_phase():
+        outs = [matched_filter_array(x, sinc_fractional_shift(h, idx * 1.0 / M)) for idx in range(M)]
+        return amax(abs(array(outs)), axis=0)
+    t_sep = time_call(per_phase)
+    t_bank = time_call(lambda: SubsampleMatchedFilter(h, M, return_phase=True).push(x))
+    print("subsample_matched_filter (N=%d, len(h)=%d, M=%d): one filter per phase %.0f samples/s, "
+          "batched bank %.0f samples/s (%.1fx)" % (N, h_len, M, N / t_sep, N / t_bank, t_sep / t_bank))
+
+
+def do_rolling_stat_bench(N=20000):
+    x = randn(N) + 1j * randn(N)
+
+    def push_chunks(stream, chunk_size=64):
+        return hstack([stream.push(x[idx:idx + chunk_size]) for idx in range(0, N, chunk_size)])
+
+    for win_len in [16, 256]:
+        t_ref = time_call(reference_rolling_abs_mean, x, win_len)
+        t_arr = time_call(rolling_stat_array, x, win_len, "abs_mean")
+        t_stream = time_call(lambda: push_chunks(RollingAbsMean(win_len)))
+        t_gen = time_call(lambda: acollect(rolling_abs_mean(x, win_len)))
+        print("rolling_abs_mean (N=%d, window %d): per-sample %.0f samples/s, array %.0f samples/s (%.0fx), "
+              "64-sample pushes %.0f samples/s, chunked generator %.0f samples/s" %
+              (N, win_len, N / t_ref, N / t_arr, t_ref / t_arr, N / t_stream, N / t_gen))
+
+
+def do_suppress_peaks_bench(N=20000):
+    x = randn(N)
+
+    t_ref = time_call(reference_suppress_peaks, x, 1.0)
+    t_arr = time_call(suppress_peaks_array, x, 1.0)
+    t_gen = time_call(lambda: acollect(suppress_peaks(x, 1.0)))
+    print("suppress_peaks (N=%d): per-sample %.0f samples/s, array %.0f samples/s (%.0fx), "
+          "chunked generator %.0f samples/s" % (N, N / t_ref, N / t_arr, t_ref / t_arr, N / t_gen))
+
+
+if __name__ == "__main__":
+    do_matched_filter_bench()
+    do_subsample_matched_filter_bench()
+    do_rolling_stat_bench()
+    do_suppress_peaks_bench()
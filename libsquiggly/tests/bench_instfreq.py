@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+from numpy import *
+from scipy import *
+from libsquiggly.instfreq import *
+from libsquiggly.util import *
+from utils import *
+from bench_tfr import time_call
+
+
+def do_lpc_freqtrack_bench(N=8192, win_len=128):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    for order in [2, 4]:
+        for step in [1, 8]:
+            t_ref = time_call(reference_lpc_freqtrack, x, order, win_len, step)
+            t_batch = time_call(lpc_freqtrack, x, order, win_len, step)
+            print("lpc_freqtrack (N=%d, order=%d, step=%d): window-at-a-time %.0f samples/s, "
+                  "batched %.0f samples/s (%.0fx)" % (N, order, step, N / t_ref, N / t_batch, t_ref / t_batch))
+
+
+def do_lpc_pole_freqs_bench(N=65536):
+    from libsquiggly.instfreq.lpc import lpc_pole_freqs
+    for order in [2, 3, 6]:
+        A = hstack((ones((N, 1)), randn(N, order)))
+
+        t_roots = time_call(lambda: [roots(a) for a in A])
+        methods = ["eig", "aberth", "closed"] if order <= 2 else ["eig", "aberth"]
+        rates = ["%s %.0f models/s (%.0fx)" % (method, N / t, t_roots / t)
+                 for method, t in [(method, time_call(lpc_pole_freqs, A, 2.0, method)) for method in methods]]
+        print("lpc_pole_freqs (%d order-%d models): roots() %.0f models/s, %s" %
+              (N, order, N / t_roots, ", ".join(rates)))
+
+
+def do_lpc_freqtrack_stream_bench(N=8192, order=2):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    for win_len in [128, 1024]:
+        t_ref = time_call(reference_lpc_freqtrack, x, order, win_len)
+        t_stream = time_call(lambda: collect(lpc_freqtrack_stream(x, order, win_len)))
+        print("lpc_freqtrack_stream (N=%d, order=%d, win_len=%d): window-at-a-time %.0f samples/s, "
+              "sliding autocorrelation %.0f samples/s (%.0fx)" % (N, order, win_len, N / t_ref, N / t_stream,
+                                                                  t_ref / t_stream))
+
+
+def do_lpc_tracker_bench(N=65536, order=2, win_len=128):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    def track(chunk_size):
+        tracker = LPCTracker(order, win_len, block_size=chunk_size)
+        for idx in range(0, N, chunk_size):
+            tracker.push(x[idx:idx + chunk_size])
+
+    for chunk_size in [64, 1024]:
+        t_track = time_call(track, chunk_size)
+        print("LPCTracker (N=%d, order=%d, win_len=%d, %d-sample chunks): %.0f samples/s" %
+              (N, order, win_len, chunk_size, N / t_track))
+
+
+def do_lsharm_bench(N=2048, win_len=100):
+    from libsquiggly.instfreq.lsharm import lsharm_power
+    x, f = gen_harmonic_track(N, K=5, f0=.15, df=.05)
+    freqs = linspace(.1, 1, 100)
+    weights = [1, .5, .5]
+
+    t_ref = time_call(reference_lsharm_power, x, freqs, weights, 2.0, win_len)
+    t_bank = time_call(lsharm_power, x, freqs, weights, 2.0, win_len)
+    print("lsharm_freqtrack (N=%d, %d fundamentals, %d harmonics): Goertzel filter loops %.0f samples/s, "
+          "filterbank matrix %.0f samples/s (%.0fx)" % (N, len(freqs), len(weights), N / t_ref, N / t_bank,
+                                                       t_ref / t_bank))
+
+
+if __name__ == "__main__":
+    do_lpc_freqtrack_bench()
+    do_lpc_pole_freqs_bench()
+    do_lpc_freqtrack_stream_bench()
+    do_lpc_tracker_bench()
+    do_lsharm_bench()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+from timeit import default_timer
+from numpy import *
+from scipy import *
+from utils import *
+from libsquiggly.tfr import *
+
+
+def time_call(func, *args, **kwargs):
+    """
+    Return the wall-clock time (in seconds) taken by a single call of `func`
+    """
+    start = default_timer()
+    func(*args, **kwargs)
+    return default_timer() - start
+
+
+def do_stft_bench(N=65536, NFFT=256):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    for noverlap in [NFFT // 2, NFFT - 1]:
+        t_loop = time_call(reference_stft, x, NFFT, noverlap=noverlap)
+        t_vec = time_call(stft, x, NFFT, noverlap=noverlap)
+        print("stft (N=%d, NFFT=%d, noverlap=%d): loop %.3fs, vectorized %.3fs (%.1fx)" %
+              (N, NFFT, noverlap, t_loop, t_vec, t_loop / t_vec))
+
+
+def do_stft_multichannel_bench(N=16384, NFFT=256, channels=32):
+    import os
+    X = array([gen_fm_track(N, f0=.5, df=.35)[0] for idx in range(channels)])
+
+    t_loop = time_call(lambda: array([stft(x, NFFT, noverlap=NFFT - 1) for x in X]))
+    t_batch = time_call(stft, X, NFFT, noverlap=NFFT - 1)
+    t_workers = time_call(stft, X, NFFT, noverlap=NFFT - 1, workers=-1)
+    print("stft (%d channels, N=%d, NFFT=%d): per-channel %.3fs, batched %.3fs (%.1fx), "
+          "batched across %s CPUs %.3fs (%.1fx)" % (channels, N, NFFT, t_loop, t_batch, t_loop / t_batch,
+                                                   os.cpu_count() if hasattr(os, "cpu_count") else "all",
+                                                   t_workers, t_loop / t_workers))
+
+
+def do_stft_cache_bench(N=2048, NFFT=256, calls=1000):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    def uncached():
+        window_cache.clear()
+        buffer_cache.clear()
+        stft(x, NFFT)
+    t_uncached = sum([time_call(uncached) for idx in range(calls)])
+    t_cached = sum([time_call(stft, x, NFFT) for idx in range(calls)])
+    print("stft (%d calls, N=%d, NFFT=%d): uncached %.3fs, cached %.3fs (%.1fx)" %
+          (calls, N, NFFT, t_uncached, t_cached, t_uncached / t_cached))
+
+
+def do_istft_bench(N=65536, NFFT=256, calls=20):
+    # istft should run at least as fast as the forward transform it inverts.  Each is
+    # timed at its best of `calls` calls, as a single call takes around a millisecond.
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    for noverlap in [NFFT // 2, 3 * NFFT // 4]:
+        P = stft(x, NFFT, noverlap=noverlap, output="complex", full_spectrum=True)
+        t_stft = min([time_call(stft, x, NFFT, noverlap=noverlap, output="complex", full_spectrum=True)
+                      for idx in range(calls)])
+        t_istft = min([time_call(istft, P, NFFT, noverlap=noverlap, length=N) for idx in range(calls)])
+        print("istft (N=%d, NFFT=%d, noverlap=%d): stft %.4fs, istft %.4fs (%.2fx)%s" %
+              (N, NFFT, noverlap, t_stft, t_istft, t_istft / t_stft,
+               "" if t_istft <= 1.1 * t_stft else "  WARNING: istft is slower than stft!"))
+
+
+def do_reassignment_bench(N=16384, NFFT=256):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+
+    t_gckd = time_call(gckd, x, NFFT)
+    for noverlap in [NFFT - 1, 3 * NFFT // 4]:
+        t_stft = time_call(stft, x, NFFT, noverlap=noverlap)
+        for mode in ["reassign", "synchrosqueeze"]:
+            t_re = time_call(reassigned_stft, x, NFFT, noverlap=noverlap, mode=mode)
+            print("reassigned_stft (N=%d, NFFT=%d, noverlap=%d, %s): stft %.3fs, gckd %.3fs, reassigned %.3fs (%.1fx vs gckd)" %
+                  (N, NFFT, noverlap, mode, t_stft, t_gckd, t_re, t_gckd / t_re))
+
+
+def do_gckd_bench(N=4096, NFFT=256):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    G = GCKD(NFFT)
+
+    t_loop = time_call(G.calculate, x, method="loop")
+    for method in ["vectorized", "recursive"]:
+        t_vec = time_call(G.calculate, x, method=method)
+        print("GCKD (N=%d, NFFT=%d): loop %.3fs, %s %.3fs (%.1fx)" %
+              (N, NFFT, t_loop, method, t_vec, t_loop / t_vec))
+
+
+def do_gckd_workers_bench(N=65536, NFFT=256, workers=[1, 2, 4, 8]):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    G = GCKD(NFFT)
+
+    t_single = time_call(G.calculate, x)
+    for w in workers:
+        t_w = time_call(G.calculate, x, workers=w)
+        print("GCKD (N=%d, NFFT=%d): %d workers %.3fs (%.1fx)" %
+              (N, NFFT, w, t_w, t_single / t_w))
+
+
+def do_gckd_band_bench(N=65536, NFFT=256, step=8, fmin=.2, fmax=.22):
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    G = GCKD(NFFT)
+
+    t_full = time_call(G.calculate, x)
+    t_band = time_call(G.calculate, x, step=step, fmin=fmin, fmax=fmax)
+    print("GCKD (N=%d, NFFT=%d): full %.3fs, step=%d band [%.2f, %.2f] %.3fs (%.1fx)" %
+          (N, NFFT, t_full, step, fmin, fmax, t_band, t_full / t_band))
+
+
+if __name__ == "__main__":
+    do_stft_bench()
+    do_stft_multichannel_bench()
+    do_istft_bench()
+    do_stft_cache_bench()
+    do_reassignment_bench()
+    do_gckd_bench()
+    do_gckd_workers_bench()
+    do_gckd_band_bench()
@@ -30,6 +30,166 @@ def do_peak_suppression_test():
     return True
 
 
+def do_matched_filter_array_test(N=1000):
+    # The block engine must match every output of the sample-at-a-time matched filter
+    barker = array([1, -1, 1, 1, -1, 1, 1, 1, -1, -1, -1])
+    # Large DC offsets, alone and stepping partway through, must not swamp the windows' energy
+    offset_step = hstack((zeros(N // 3), 1e4 + .01 * randn(N - N // 3)))
+    for x in [randn(N), .15 * randn(N) + .15j * randn(N), ones(N), 1e6 + randn(N),
+              1e4 + .01 * randn(N), offset_step, 1e6 + .01 * randn(N) + .01j * randn(N)]:
+        for step in [1, 3, 20]:
+            for mode in ["same", "valid"]:
+                x_hat = matched_filter_array(x, barker, step, mode, block_size=64)
+                x_ref = reference_matched_filter(x, barker, step, mode)
+                if len(x_hat) != len(x_ref) or not allclose(x_hat, x_ref):
+                    print("ERROR: matched_filter_array() does not match the reference matched filter!")
+                    return False
+    return True
+
+
+def do_subsample_matched_filter_test(N=600, M=5):
+    # The batched polyphase bank must pick the same value and phase as filtering with each
+    # shifted template separately
+    barker = array([1, -1, 1, 1, -1, 1, 1, 1, -1, -1, -1])
+    for x in [.15 * randn(N) + .15j * randn(N), 1e4 + .01 * randn(N)]:
+        x_ref = array([reference_matched_filter(x, sinc_fractional_shift(barker, idx * 1.0 / M))
+                       for idx in range(M)])
+        phase_ref = argmax(abs(x_ref), axis=0)
+        x_ref = x_ref[phase_ref, arange(x_ref.shape[1])]
+
+        x_hat = acollect(subsample_matched_filter(x, barker, M, return_phase=True))
+        if len(x_hat) != len(x_ref) or not allclose(x_hat["value"], x_ref):
+            print("ERROR: subsample_matched_filter() does not match the per-phase matched filters!")
+            return False
+        if any(x_hat["phase"] != phase_ref):
+            print("ERROR: subsample_matched_filter() returned the wrong winning phases!")
+            return False
+        if not allclose(acollect(subsample_matched_filter(x, barker, M)), x_ref):
+            print("ERROR: subsample_matched_filter() values change with `return_phase`!")
+            return False
+
+    # mode="valid" skips the windows reaching back before the start of the data, as
+    # matched_filter() does, rather than being ignored
+    x = .15 * randn(200) + .15j * randn(200)
+    x_ref = array([reference_matched_filter(x, sinc_fractional_shift(barker, idx * 1.0 / M), mode="valid")
+                   for idx in range(M)])
+    x_ref = x_ref[argmax(abs(x_ref), axis=0), arange(x_ref.shape[1])]
+    x_hat = acollect(subsample_matched_filter(x, barker, M, mode="valid"))
+    if len(x_hat) != len(x) - len(barker) or len(x_hat) != len(x_ref) or not allclose(x_hat, x_ref):
+        print("ERROR: subsample_matched_filter() with mode=\"valid\" does not match the per-phase matched filters!")
+        return False
+    return True
+
+
+def do_rolling_stat_test(N=600):
+    # Running sums must match every statistic calculated directly over each window, however
+    # the stream is chunked and however often the sums are renormalized, even atop a large
+    # DC offset
+    for x in [.15 * randn(N) + .15j * randn(N) + 1, 1e4 + .01 * randn(N), 1e6 + .01 * randn(N)]:
+        for win_len in [1, 7, 100]:
+            windows = array([x[idx:idx + win_len] for idx in range(N - win_len + 1)])
+            refs = {
+                "mean": mean(windows, axis=1),
+                "abs_mean": mean(abs(windows), axis=1),
+                "rms": sqrt(mean(abs(windows)**2, axis=1)),
+                "variance": var(windows, axis=1),
+            }
+            for stat in refs:
+                stream = RollingStatistic(win_len, stat, renorm_interval=37)
+                outputs = [rolling_stat_array(x, win_len, stat, renorm_interval=50),
+                           acollect(rolling_stat(x, win_len, stat)),
+                           hstack([stream.push(chunk) for chunk in split_chunks(x)])]
+                for x_hat in outputs:
+                    if len(x_hat) != len(refs[stat]) or not allclose(x_hat, refs[stat]):
+                        print("ERROR: rolling_stat() does not match the %s of each window!" % stat)
+                        return False
+    return True
+
+
+def do_suppress_peaks_array_test(N=2000):
+    # Rounding makes for runs with tied maxima, of which the first must be kept
+    x = .3 * randn(N)
+    for x in [x, around(4 * x) / 4, x + .3j * randn(N)]:
+        x_ref = reference_suppress_peaks(x, .3)
+        suppressor = PeakSuppressor(.3)
+        outputs = [suppress_peaks_array(x, .3),
+                   hstack([suppressor.push(chunk) for chunk in split_chunks(x, [1, 2, 5, 64])] +
+                          [suppressor.flush()])]
+        for x_hat in outputs:
+            if len(x_hat) != len(x_ref) or not array_equal(x_hat, x_ref):
+                print("ERROR: suppress_peaks_array() does not match the reference peak suppression!")
+                return False
+    return True
+
+
+def do_detection_test(N=2000, M=5):
+    # Detections must record exactly the peaks (and phases) left in the dense peakstream
+    barker = array([1, -1, 1, 1, -1, 1, 1, 1, -1, -1, -1])
+    x = .15 * randn(N) + .15j * randn(N)
+    for idx in range(100, N - 20, 150):
+        x[idx:idx + 11] += sinc_fractional_shift(barker, rand())
+
+    dense = acollect(subsample_matched_filter(x, barker, M, return_phase=True))
+    peaks = acollect(suppress_peaks(dense["value"], .6))
+    peak_idxs = flatnonzero(peaks)
+    runs = hstack([[0], abs(dense["value"]) > .6, [0]])
+    run_lengths = flatnonzero(diff(runs) == -1) - flatnonzero(diff(runs) == 1)
+
+    detections = [acollect(suppress_peaks(dense["value"], .6, output="detections")),
+                  hstack(list(subsample_matched_filter_chunks(split_chunks(x), barker, M, detect_thresh=.6)))]
+    for det in detections:
+        if len(det) != len(peak_idxs) or any(det["index"] != peak_idxs) or \
+                not allclose(det["value"], peaks[peak_idxs]) or any(det["run_length"] != run_lengths):
+            print("ERROR: Detections do not match the suppressed peakstream!")
+            return False
+    det = detections[1]
+    if any(det["phase"] != dense["phase"][peak_idxs]) or not allclose(det["offset"], det["phase"] * 1.0 / M):
+        print("ERROR: Detections do not record the winning polyphase matched filter!")
+        return False
+
+    det = acollect(matched_filter(x, barker, detect_thresh=.6))
+    if any(det["index"] != flatnonzero(acollect(suppress_peaks(matched_filter_array(x, barker), .6)))):
+        print("ERROR: matched_filter() detections do not match its suppressed peakstream!")
+        return False
+    return True
+
+
+def split_chunks(x, chunk_sizes=[1, 7, 100]):
+    """
+    Yield x in chunks, cycling through the given chunk sizes
+    """
+    idx = 0
+    num_chunks = 0
+    while idx < len(x):
+        chunk_len = chunk_sizes[num_chunks % len(chunk_sizes)]
+        yield x[idx:idx + chunk_len]
+        idx += chunk_len
+        num_chunks += 1
+
+
+def do_chunked_streaming_test(N=500):
+    # Every streaming function must give the same results whether fed an array, an
+    # iterator of samples or an iterator of arbitrarily sized chunks
+    barker = array([1, -1, 1, 1, -1, 1, 1, 1, -1, -1, -1])
+    x = .15 * randn(N) + .15j * randn(N)
+    tests = [
+        (lambda d: matched_filter(d, barker, 3), lambda d: matched_filter_chunks(d, barker, 3),
+            reference_matched_filter(x, barker, 3)),
+        (lambda d: rolling_abs_mean(d, 7), lambda d: rolling_abs_mean_chunks(d, 7),
+            reference_rolling_abs_mean(x, 7)),
+        (lambda d: suppress_peaks(d, .3), lambda d: suppress_peaks_chunks(d, .3),
+            reference_suppress_peaks(x, .3)),
+    ]
+    for scalar_func, chunk_func, x_ref in tests:
+        outputs = [acollect(scalar_func(x)), acollect(scalar_func(v for v in x)),
+                   hstack(list(chunk_func(split_chunks(x))))]
+        for x_hat in outputs:
+            if len(x_hat) != len(x_ref) or not allclose(x_hat, x_ref):
+                print("ERROR: Chunked streaming does not match the reference!")
+                return False
+    return True
+
+
 def do_jittered_mfilt_test():
     # Give ourselves a nice spreading sequence
     barker = array([1, -1, 1, 1, -1, 1, 1, 1, -1, -1, -1])
@@ -99,3 +259,21 @@ class TestInstantenousFrequencyEstimation(TestCase):
 
     def test_jittered_mfilt(self):
         do_jittered_mfilt_test()
+
+    def test_matched_filter_array(self):
+        self.assertTrue(do_matched_filter_array_test())
+
+    def test_subsample_matched_filter(self):
+        self.assertTrue(do_subsample_matched_filter_test())
+
+    def test_rolling_stat(self):
+        self.assertTrue(do_rolling_stat_test())
+
+    def test_suppress_peaks_array(self):
+        self.assertTrue(do_suppress_peaks_array_test())
+
+    def test_detection(self):
+        self.assertTrue(do_detection_test())
+
+    def test_chunked_streaming(self):
+        self.assertTrue(do_chunked_streaming_test())
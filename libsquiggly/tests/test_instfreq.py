@@ -54,6 +54,100 @@ def do_instfreq_test(x, f_gt, sig_name):
     close(f)
 
 
+def do_lpc_freqtrack_test(N=2048):
+    # The batched LPC track must match modeling every window separately
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    for order in [1, 2, 5]:
+        for win_len, step in [(128, 1), (37, 3), (64, 10)]:
+            f_ref, err_ref = reference_lpc_freqtrack(x, order, win_len, step)
+            f_lpc, err_lpc = lpc_freqtrack(x, order, win_len, step)
+            if not allclose(f_lpc, f_ref, atol=1e-9) or not allclose(err_lpc, err_ref):
+                print("ERROR: lpc_freqtrack() does not match the window-at-a-time reference!")
+                return False
+    return True
+
+
+def do_lpc_pole_freqs_test(N=2000):
+    # Every root-finding method must pick the same strongest pole as roots()
+    from libsquiggly.instfreq.lpc import lpc_pole_freqs
+    for order in [1, 2, 3, 5, 8]:
+        A = hstack((ones((N, 1)), 2 * randn(N, order)))
+        # Every root of a model with zero coefficients is zero
+        A[0, 1:] = 0
+        f_ref = array([angle(R[argmax(abs(R))]) for R in map(roots, A)]) / pi
+        methods = ["closed", "aberth", "eig"] if order <= 2 else ["aberth", "eig"]
+        for method in methods:
+            if not allclose(lpc_pole_freqs(A, 2.0, method), f_ref):
+                print("ERROR: lpc_pole_freqs() with method %s does not match roots()!" % method)
+                return False
+    return True
+
+
+def do_lpc_freqtrack_stream_test(N=2048):
+    # Streaming the zero-padded signal must track every complete window of lpc_freqtrack()
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    for order in [1, 2, 5]:
+        for win_len in [128, 37]:
+            f_ref, err_ref = lpc_freqtrack(x, order, win_len)
+            nlen = N + 2 * (win_len // 2) - win_len
+            x_pad = hstack((zeros(win_len // 2), x, zeros(win_len // 2)))
+            chunks = (x_pad[idx:idx + 7] for idx in range(0, len(x_pad), 7))
+            for data in [x_pad, chunks]:
+                track = array(collect(lpc_freqtrack_stream(data, order, win_len, renorm_interval=50)))
+                if not allclose(track[:nlen, 0], f_ref[:nlen]) or not allclose(track[:nlen, 1], err_ref[:nlen]):
+                    print("ERROR: lpc_freqtrack_stream() does not match lpc_freqtrack()!")
+                    return False
+    return True
+
+
+def do_lpc_tracker_test(N=2048, win_len=64):
+    # Pushing chunks of any size must model every complete window, within reused buffers
+    from libsquiggly.instfreq.lpc import lpc_frames, lpc_pole_freqs
+    x, f = gen_fm_track(N, f0=.5, df=.35)
+    for order in [1, 2, 4]:
+        A, err, k = lpc_frames(x, order, win_len)
+        f_ref = lpc_pole_freqs(A)
+        tracker = LPCTracker(order, win_len, renorm_interval=100, block_size=32)
+        outputs = []
+        for idx, chunk_len in [(0, 1), (1, 7), (8, 30), (38, 500), (538, N - 538)]:
+            outputs += [tuple(out.copy() for out in tracker.push(x[idx:idx + chunk_len]))]
+        f_lpc = hstack([out[0] for out in outputs])
+        err_lpc = hstack([out[1] for out in outputs])
+        if not allclose(f_lpc, f_ref) or not allclose(err_lpc, 1.0 / err):
+            print("ERROR: LPCTracker does not match modeling every window separately!")
+            return False
+
+        f_first = tracker.push(x[:100])[0]
+        if not shares_memory(f_first, tracker.push(x[100:200])[0]):
+            print("ERROR: LPCTracker does not reuse its buffers between chunks!")
+            return False
+
+    # Complex chunks must be rejected rather than silently losing their imaginary part
+    try:
+        SlidingAutocorrelation(2, win_len).push(x[:100] + 1j)
+        print("ERROR: SlidingAutocorrelation accepted complex input!")
+        return False
+    except ValueError:
+        pass
+    return True
+
+
+def do_lsharm_power_test(N=300):
+    # The Goertzel filterbank matrix must match running every Goertzel filter over every window
+    from libsquiggly.instfreq.lsharm import lsharm_power
+    x, f = gen_harmonic_track(N, K=5, f0=.15, df=.05)
+    freqs = linspace(.1, 1, 25)
+    weights = [1, .5, .25, .5]
+    for x in [x, x + .1j * randn(N)]:
+        for win_len, skip in [(100, 1), (37, 3)]:
+            P_ref = reference_lsharm_power(x, freqs, weights, 2.0, win_len, skip)
+            P = lsharm_power(x, freqs, weights, 2.0, win_len, skip)
+            if P.shape != P_ref.shape or not allclose(P, P_ref):
+                print("ERROR: lsharm_power() does not match the Goertzel filters!")
+                return False
+    return True
+
+
 from unittest import TestCase
 class TestInstantenousFrequencyEstimation(TestCase):
     def test_sin(self, N=8192):
@@ -68,6 +162,21 @@ class TestInstantenousFrequencyEstimation(TestCase):
         x_hopping, f_hopping = gen_hopping_track(N, 7, fmin=.2, fmax=.8)
         do_instfreq_test(x_hopping, f_hopping, "frequency-hopping sinusoid")
 
+    def test_lpc_freqtrack(self):
+        self.assertTrue(do_lpc_freqtrack_test())
+
+    def test_lpc_pole_freqs(self):
+        self.assertTrue(do_lpc_pole_freqs_test())
+
+    def test_lpc_freqtrack_stream(self):
+        self.assertTrue(do_lpc_freqtrack_stream_test())
+
+    def test_lpc_tracker(self):
+        self.assertTrue(do_lpc_tracker_test())
+
+    def test_lsharm_power(self):
+        self.assertTrue(do_lsharm_power_test())
+
     def test_wideband(self, N=8192):
         x_wide, f_wide = gen_wideband_track(N, width=.1, f0=.5, df=.15)
         do_instfreq_test(x_wide, f_wide, "wideband nonstationary signal")
@@ -6,6 +6,7 @@ from matplotlib.pyplot import *
 from utils import *
 from libsquiggly.util import *
 from libsquiggly.tfr import *
+from scipy.signal import hann
 
 # Generic test harness for our instantaneous-frequency estimation code
 def do_tfr_test(x, f, sig_name):
@@ -36,6 +37,275 @@ def do_tfr_test(x, f, sig_name):
     close(f)
 
 
+def do_stft_equivalence_test(x, NFFT=128):
+    # The vectorized stft must match the reference frame-at-a-time stft
+    for noverlap in [0, NFFT // 2, NFFT - 1]:
+        for zeropadding in ["sandwich", "after"]:
+            if zeropadding == "after" and 2 * noverlap > NFFT:
+                continue
+            P_ref = reference_stft(x, NFFT, noverlap=noverlap, zeropadding=zeropadding)
+            P = stft(x, NFFT, noverlap=noverlap, zeropadding=zeropadding, block_size=100)
+            if P_ref.shape != P.shape or not allclose(P_ref, P):
+                print("ERROR: Vectorized stft does not match the reference stft!")
+                return False
+    return True
+
+
+def do_stft_streaming_test(x, NFFT=128, noverlap=96, chunk_sizes=[1, 7, 100, 500]):
+    # Feeding x through STFT.push() in chunks must match stft() on all of x
+    P_batch = stft(x, NFFT, noverlap=noverlap, zeropadding="after")
+
+    S = STFT(NFFT, noverlap=noverlap)
+    P_chunks = []
+    idx = 0
+    while idx < len(x):
+        chunk_len = chunk_sizes[len(P_chunks) % len(chunk_sizes)]
+        P_chunks += [S.push(x[idx:idx + chunk_len])]
+        idx += chunk_len
+    P_stream = hstack(P_chunks + [S.flush()])
+
+    if P_batch.shape != P_stream.shape or not allclose(P_batch, P_stream):
+        print("ERROR: Streaming STFT does not match the batch stft!")
+        return False
+    return True
+
+
+def do_stft_output_test(x, NFFT=128, noverlap=96):
+    # Every output mode must agree with the complex spectrum
+    P = stft(x, NFFT, noverlap=noverlap, output="complex")
+    expected = {
+        "magnitude": abs(P),
+        "power": abs(P)**2,
+        "db": 20 * log10(abs(P)),
+    }
+    for output in expected:
+        out = empty(P.shape)
+        P_out = stft(x, NFFT, noverlap=noverlap, output=output, out=out)
+        if P_out is not out or not allclose(out, expected[output]):
+            print("ERROR: stft output mode \"%s\" does not match the complex stft!" % output)
+            return False
+    return True
+
+
+def do_stft_multichannel_test(X, NFFT=128, noverlap=96):
+    # Transforming every channel at once must match transforming them one at a time
+    P = stft(X, NFFT, noverlap=noverlap)
+    P_ref = array([stft(x, NFFT, noverlap=noverlap) for x in X])
+    P_T = stft(X.T, NFFT, noverlap=noverlap, axis=0)
+
+    if P.shape != P_ref.shape or not allclose(P, P_ref) or not allclose(P_T, P_ref):
+        print("ERROR: Multichannel stft does not match the per-channel stft!")
+        return False
+
+    # Spreading the FFTs across threads must not change the result
+    stream = STFT(NFFT, noverlap=noverlap, workers=2)
+    P_stream = hstack((stream.push(X[0]), stream.flush()))
+    if not allclose(stft(X, NFFT, noverlap=noverlap, workers=2), P) or \
+            not allclose(P_stream, stft(X[0], NFFT, noverlap=noverlap, zeropadding="after")):
+        print("ERROR: stft with several workers does not match the single-threaded stft!")
+        return False
+    return True
+
+
+def do_istft_test(x, NFFT=128, noverlaps=[64, 96], chunk_sizes=[1, 7, 100]):
+    # A periodic hann window overlap-adds to a constant at these overlaps, so
+    # istft() must reconstruct every sample covered by a frame exactly
+    window = lambda N: hann(N, sym=False)
+    for noverlap in noverlaps:
+        step = NFFT - noverlap
+        for signal in [x, x + 1j * roll(x, 1)]:
+            P = stft(signal, NFFT, noverlap=noverlap, windowfunc=window, output="complex", full_spectrum=True)
+            y = istft(P, NFFT, noverlap=noverlap, windowfunc=window, length=len(signal))
+            L = (P.shape[-1] - 1) * step
+            if y.shape != signal.shape or not allclose(y[:L], signal[:L]):
+                print("ERROR: istft(stft(x)) does not reconstruct x with noverlap=%d!" % noverlap)
+                return False
+
+            # Feeding the columns through ISTFT.push() in chunks must match istft()
+            I = ISTFT(NFFT, noverlap=noverlap, windowfunc=window)
+            y_chunks = []
+            idx = 0
+            while idx < P.shape[-1]:
+                chunk_len = chunk_sizes[len(y_chunks) % len(chunk_sizes)]
+                y_chunks += [I.push(P[:, idx:idx + chunk_len])]
+                idx += chunk_len
+            y_stream = hstack(y_chunks + [I.flush()])
+            y_batch = istft(P, NFFT, noverlap=noverlap, windowfunc=window, zeropadding="after",
+                            length=len(y_stream))
+            if not allclose(y_stream, y_batch):
+                print("ERROR: Streaming ISTFT does not match the batch istft!")
+                return False
+    return True
+
+
+def do_stft_cache_test(x, NFFT=128, noverlap=96):
+    # Repeated transforms must reuse the cached window and work buffer, and reuse
+    # must not change the result
+    P = stft(x, NFFT, noverlap=noverlap)
+    window_hits, buffer_hits = window_cache.hits, buffer_cache.hits
+    P_again = stft(x, NFFT, noverlap=noverlap)
+    if window_cache.hits != window_hits + 1 or buffer_cache.hits != buffer_hits + 1:
+        print("ERROR: stft window or work buffer was not cached!")
+        print(window_cache.stats(), buffer_cache.stats())
+        return False
+    if not array_equal(P, P_again):
+        print("ERROR: stft with cached buffers does not match the first stft!")
+        return False
+
+    # Cached windows are shared, so must not be writeable
+    if cached_window(hann, NFFT).flags.writeable:
+        print("ERROR: Cached window is writeable!")
+        return False
+
+    # The cache must never grow past its size limit
+    cache = LRUCache(maxsize=2)
+    for key in range(5):
+        cache.get(key, lambda: key)
+    if cache.stats() != {"hits": 0, "misses": 5, "size": 2, "maxsize": 2, "nbytes": 0,
+                         "maxbytes": None} or cache.get(4, None) != 4:
+        print("ERROR: LRUCache did not evict its least recently used entries!")
+        return False
+
+    # Nor past its byte limit, and arrays larger than the limit are not cached at all
+    cache = LRUCache(maxbytes=3 * 80)
+    for key in range(5):
+        cache.get(key, lambda: zeros(10))
+    cache.get("big", lambda: zeros(100))
+    if cache.stats()["size"] != 3 or cache.nbytes != 3 * 80 or "big" in cache.entries:
+        print("ERROR: LRUCache did not keep to its byte limit!")
+        print(cache.stats())
+        return False
+    # Tuples of arrays (such as filterbanks) count every array towards the limit
+    cache.get("pair", lambda: (zeros(10), zeros(10)))
+    cache.get("big pair", lambda: (zeros(10), zeros(30)))
+    if cache.stats()["size"] != 2 or cache.nbytes != 3 * 80 or "big pair" in cache.entries:
+        print("ERROR: LRUCache did not count tuples of arrays towards its byte limit!")
+        print(cache.stats())
+        return False
+    if window_cache.maxbytes is None:
+        print("ERROR: window_cache has no byte limit!")
+        return False
+    big = work_buffer((buffer_cache.maxbytes // 8 + 1,), float64, "test")
+    if work_buffer(big.shape, float64, "test") is big:
+        print("ERROR: work_buffer cached a buffer larger than buffer_cache.maxbytes!")
+        return False
+    return True
+
+
+def do_reassignment_test(N=4000, NFFT=256, noverlap=192, f0=.2137):
+    # A sinusoid between bins must be squeezed into a single bin, where the
+    # spectrogram smears it across several
+    x = cos(pi * f0 * arange(N))
+    S = stft(x, NFFT, noverlap=noverlap, output="power")[:, 4:-4]
+    for mode in ["reassign", "synchrosqueeze"]:
+        P = reassigned_stft(x, NFFT, noverlap=noverlap, mode=mode, output="power")[:, 4:-4]
+        if (P.max(axis=0) / P.sum(axis=0)).min() < .99 or (S.max(axis=0) / S.sum(axis=0)).max() > .9:
+            print("ERROR: Reassigned spectrogram (%s) did not concentrate the sinusoid!" % mode)
+            return False
+        if any(argmax(P, axis=0) != int(round(f0 * NFFT / 2))):
+            print("ERROR: Reassigned spectrogram (%s) moved the sinusoid to the wrong bin!" % mode)
+            return False
+
+    # Every channel must be reassigned independently
+    X = array([x, x[::-1]])
+    P = reassigned_stft(X, NFFT, noverlap=noverlap)
+    if not allclose(P[1], reassigned_stft(x[::-1], NFFT, noverlap=noverlap)):
+        print("ERROR: Multichannel reassigned spectrogram does not match per-channel spectrograms!")
+        return False
+    return True
+
+
+def do_gckd_equivalence_test(x, NFFT=64):
+    # The vectorized engine must match the reference per-sample loop
+    G = GCKD(NFFT)
+    P_loop = G.calculate(x, method="loop")
+    for method in ["vectorized", "recursive"]:
+        P_vec = G.calculate(x, method=method, block_size=100)
+
+        if P_loop.shape != P_vec.shape or not allclose(P_loop, P_vec):
+            print("ERROR: %s GCKD does not match the reference loop!" % method)
+            return False
+
+    # Spreading blocks across threads must not change anything
+    P_threads = G.calculate(x, block_size=100, workers=3)
+    if not array_equal(P_threads, G.calculate(x, block_size=100)):
+        print("ERROR: Multithreaded GCKD does not match the single-threaded GCKD!")
+        return False
+    return True
+
+
+def do_gckd_streaming_test(x, NFFT=64, chunk_sizes=[1, 7, 100, 500]):
+    # Feeding x through push() in chunks must match calculate() on all of x
+    G = GCKD(NFFT)
+    P_batch = G.calculate(x)
+
+    P_chunks = []
+    idx = 0
+    while idx < len(x):
+        chunk_len = chunk_sizes[len(P_chunks) % len(chunk_sizes)]
+        P_chunks += [G.push(x[idx:idx + chunk_len])]
+        idx += chunk_len
+    P_stream = hstack(P_chunks + [G.flush()])
+
+    if P_batch.shape != P_stream.shape or not allclose(P_batch, P_stream):
+        print("ERROR: Streaming GCKD does not match the batch GCKD!")
+        return False
+    return True
+
+
+def do_gckd_band_test(x, NFFT=64, step=5, fmin=.3, fmax=.4, fbin=10.0 / 32):
+    # Decimated, band-limited output must be a slice of the full distribution, including
+    # a band of the single bin `fbin` lies on
+    G = GCKD(NFFT)
+    P_full = G.calculate(x)
+
+    for (f_lo, f_hi) in [(fmin, fmax), (fbin, fbin)]:
+        lo, hi = G.frequency_bins(f_lo, f_hi)
+        if hi <= lo:
+            print("ERROR: GCKD band [%g, %g] holds no frequency bins!" % (f_lo, f_hi))
+            return False
+        P_band = G.calculate(x, step=step, fmin=f_lo, fmax=f_hi)
+        if not allclose(P_band, P_full[lo - 1:hi - 1, ::step]):
+            print("ERROR: Band-limited GCKD does not match the full GCKD!")
+            return False
+    return True
+
+
+def do_gckd_window_cache_test(NFFT=64):
+    # The vectorized window must match sampling the window one lag at a time
+    G = GCKD(NFFT)
+    window = array([MixedWindow(k, alpha=G.alpha) for k in range(NFFT)])
+    window[0] *= 0.5
+    if not allclose(G.window, window):
+        print("ERROR: Vectorized GCKD window does not match the sampled window!")
+        return False
+
+    # Building the same distribution again must hit the cache
+    hits = window_cache.hits
+    if GCKD(NFFT).window is not G.window or window_cache.hits != hits + 1:
+        print("ERROR: GCKD window was not cached!")
+        print(window_cache.stats())
+        return False
+    return True
+
+
+def do_gckd_precision_test(N=1000, NFFT=64, f0=.2):
+    # Single precision must stay in single precision, and stay close to double
+    x = cos(2 * pi * f0 * arange(N))
+    P = gckd(x, NFFT)
+    P_single = gckd(x, NFFT, dtype=float32)
+    if P_single.dtype != float32 or not allclose(P_single, P, atol=1e-4 * abs(P).max()):
+        print("ERROR: Single-precision GCKD does not match double-precision GCKD!")
+        return False
+
+    # An analytic signal must show up at the same (positive) frequency as its real part
+    P_analytic = gckd(exp(2j * pi * f0 * arange(N)), NFFT, dtype=complex64)
+    if P_analytic.dtype != float32 or argmax(P_analytic[:, N // 2]) != argmax(P[:, N // 2]):
+        print("ERROR: Analytic GCKD does not peak at the right frequency!")
+        return False
+    return True
+
+
 from unittest import TestCase
 class TestTimeFrequencyRepresentations(TestCase):
     def test_fm_sinusoid(self, N=8196):
@@ -49,3 +319,48 @@ class TestTimeFrequencyRepresentations(TestCase):
     def test_wideband_track(self, N=8196):
         x_wideband, f_wideband = gen_wideband_track(N, width=.1, f0=.5, df=.15)
         do_tfr_test(x_wideband, f_wideband, "wideband nonstationary signal")
+
+    def test_gckd_vectorized(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_gckd_equivalence_test(x_fm))
+
+    def test_gckd_streaming(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_gckd_streaming_test(x_fm))
+
+    def test_gckd_band(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_gckd_band_test(x_fm))
+
+    def test_gckd_window_cache(self):
+        self.assertTrue(do_gckd_window_cache_test())
+
+    def test_gckd_precision(self):
+        self.assertTrue(do_gckd_precision_test())
+
+    def test_stft_vectorized(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_stft_equivalence_test(x_fm))
+
+    def test_stft_streaming(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_stft_streaming_test(x_fm))
+
+    def test_stft_output(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_stft_output_test(x_fm))
+
+    def test_stft_multichannel(self, N=1000, channels=4):
+        X = array([gen_fm_track(N, f0=.5, df=.35)[0] for idx in range(channels)])
+        self.assertTrue(do_stft_multichannel_test(X))
+
+    def test_istft(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_istft_test(x_fm))
+
+    def test_stft_cache(self, N=1000):
+        x_fm, f_fm = gen_fm_track(N, f0=.5, df=.35)
+        self.assertTrue(do_stft_cache_test(x_fm))
+
+    def test_reassignment(self):
+        self.assertTrue(do_reassignment_test())
@@ -1,6 +1,7 @@
 from numpy import *
 from scipy import *
 from scipy.signal import *
+from numpy.fft import fft
 
 
 def gen_fm_track(N, f0, df):
@@ -128,3 +129,142 @@ def gen_wideband_track(N, f0, width, df):
     # Modulator wideband process up onto frequency track, then return that in the
     # presence of noise, as well as the "ground truth" frequency track
     return carrier * modulator + 0.001 * randn(N), f
+
+
+def reference_stft(x, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwich"):
+    """
+    The original frame-at-a-time short-time fourier transform, used to check (and
+    benchmark) the vectorized `stft()` in libsquiggly.tfr.  Parameters are the same.
+    """
+    step = (NFFT - noverlap)
+    pad_amnt = step - len(x) % step
+
+    nlen = len(x) // step
+    NFFT_2 = NFFT // 2
+    P = empty((NFFT_2, nlen))
+    window = windowfunc(NFFT)
+
+    if zeropadding == "sandwich":
+        x = hstack((zeros(NFFT_2), x, zeros(NFFT_2 + pad_amnt)))
+    elif zeropadding == "after":
+        x = hstack((x, zeros(pad_amnt)))
+
+    for idx in range(nlen):
+        x_slice = x[idx * step:idx * step + NFFT]
+        P[:, idx] = abs(fft(x_slice * window)[:NFFT_2])
+    return P
+
+
+def reference_matched_filter(x, h, step=1, mode="same"):
+    """
+    The original sample-at-a-time matched filter, used to check (and benchmark) the
+    block-streaming matched filters in libsquiggly.analysis.  Parameters are the same,
+    but `x` must be an array, and an array of every output is returned.
+    """
+    h = copy(h) - mean(h)
+    h = h / sqrt(real(vdot(h, h)))
+    h_len = len(h)
+
+    # Load the first window, zero-padded before the start of x
+    buff = zeros((h_len,), x.dtype)
+    first = step - 1 if mode == "same" else max(step - 1, h_len)
+    idx = 0
+    out = []
+    while idx <= first and idx < len(x):
+        buff = roll(buff, -1, 0)
+        buff[-1] = x[idx]
+        idx += 1
+    if idx <= first:
+        return array(out)
+
+    while True:
+        x_slice = buff - mean(buff)
+        x_slice_energy = sqrt(real(vdot(x_slice, x_slice)))
+        if x_slice_energy == 0.0:
+            out += [0.0]
+        else:
+            out += [dot(x_slice, h) / x_slice_energy]
+
+        if idx + step > len(x):
+            return array(out)
+        for s in range(step):
+            buff = roll(buff, -1, 0)
+            buff[-1] = x[idx]
+            idx += 1
+
+
+def reference_rolling_abs_mean(x, N):
+    """
+    The original sample-at-a-time rolling mean of the absolute value of `x`, returning
+    the mean of every complete window of length N
+    """
+    buff = zeros(N)
+    out = []
+    for idx in range(len(x)):
+        buff = roll(buff, -1)
+        buff[-1] = abs(x[idx])
+        if idx >= N - 1:
+            out += [mean(buff)]
+    return array(out)
+
+
+def reference_suppress_peaks(x, thresh):
+    """
+    The original sample-at-a-time peak suppression: every contiguous run of samples
+    whose magnitude exceeds `thresh` is zeroed but for its maximum
+    """
+    out = []
+    idx = 0
+    while idx < len(x):
+        run = [x[idx]]
+        idx += 1
+        while abs(run[-1]) > thresh and idx < len(x):
+            run += [x[idx]]
+            idx += 1
+        if abs(run[-1]) > thresh:
+            # The run continues up to the end of x
+            out += list(array(run) * (arange(len(run)) == argmax(run)))
+        else:
+            if len(run) > 1:
+                out += list(array(run[:-1]) * (arange(len(run) - 1) == argmax(run[:-1])))
+            out += [run[0] * 0]
+    return array(out)
+
+
+def reference_lpc_freqtrack(x, order=2, win_len=128, step=1, fs=2.0):
+    """
+    The original window-at-a-time LPC frequency track of `x`, modeling every window
+    with talkbox's `lpc()` and finding the strongest pole with `roots()`
+    """
+    from libsquiggly.instfreq.talkbox import lpc
+    lpc_estimates = zeros(len(x) // step)
+    lpc_error = zeros(len(x) // step)
+    pad_len = win_len // step
+    x = hstack((zeros(pad_len // 2), x, zeros(pad_len // 2)))
+    for i in range((len(x) - pad_len) // step):
+        A, err, k = lpc(x[i * step:i * step + win_len], order)
+        R = roots(A)
+        lpc_estimates[i] = angle(R[argmax(abs(R))]) * fs / (2 * pi)
+        lpc_error[i] = 1.0 / err
+    return lpc_estimates, lpc_error
+
+
+def reference_lsharm_power(x, freqs, weights, fs=2.0, win_len=100, skip=1):
+    """
+    The original window-at-a-time least-squares harmonic power of `x`, running a
+    Goertzel filter over every window for every harmonic of every fundamental
+    frequency in `freqs`, returning the squared, weighted power of each
+    """
+    x = hstack((zeros(win_len // 2), x, zeros(win_len // 2)))
+    P = zeros(((len(x) - 2 * (win_len // 2)) // skip, len(freqs)))
+    for idx in range(P.shape[0]):
+        window = x[idx * skip:idx * skip + win_len]
+        for f_idx in range(len(freqs)):
+            f0 = freqs[f_idx]
+            for k in range(min(len(weights), int(fs / (2 * f0)))):
+                b = array([1, -exp(-2j * pi * (k + 1) * f0 / fs)])
+                a = array([1, -2 * cos(2 * pi * (k + 1) * f0 / fs), 1])
+                C = exp(-2j * pi * (k + 1) * f0 / fs * (win_len - 1)) * \
+                    lfilter(b, a, window)[-1] / sqrt(win_len)
+                P[idx, f_idx] += abs(weights[k] * C)**2
+    return P
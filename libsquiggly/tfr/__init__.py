@@ -1,6 +1,10 @@
 # Only export very specific items
-from .cone_kernel import ZhaoAtlasWindow, BornJordanWindow, MixedWindow, GCKD, gckd
-from .short_time_fourier_transform import stft
+from .cone_kernel import ZhaoAtlasWindow, BornJordanWindow, MixedWindow, GCKD, gckd, build_gckd_window, gckd_window, dft_twiddles
+from .cache import LRUCache, window_cache, buffer_cache, cached_window, work_buffer
+from .short_time_fourier_transform import stft, STFT, istft, ISTFT
+from .reassignment import reassigned_stft
 
+del cache
 del cone_kernel
+del reassignment
 del short_time_fourier_transform
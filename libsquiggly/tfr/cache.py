@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from threading import Lock, current_thread
+from numpy import asarray, dtype as as_dtype, empty
+
+
+def value_nbytes(value):
+    """
+    Return the number of bytes held by `value`: its `nbytes` if it is an array, the sum
+    over its items if it is a tuple or list (as of arrays), or zero otherwise
+    """
+    if isinstance(value, (tuple, list)):
+        return sum([value_nbytes(item) for item in value])
+    return getattr(value, "nbytes", 0)
+
+
+class LRUCache(object):
+    """
+    A bounded, thread-safe cache that evicts the least recently used entries once it
+    holds more than `maxsize` entries, or more than `maxbytes` bytes of arrays (see
+    value_nbytes()).  Values
+    are built on demand by get(), and the number of cache hits and misses are counted
+    in `hits` and `misses`.
+
+    Constructor parameters
+    ----------------------
+    maxsize : int
+        The maximum number of entries to hold onto (default 32)
+    maxbytes : int or None
+        The maximum total size of the cached values (default None, unlimited).  A
+        value larger than this on its own is returned without being cached.
+    """
+
+    def __init__(self, maxsize=32, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """
+        Return the value cached under `key`, calling `factory()` to build (and cache)
+        it if it is not already present.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                value = self.entries.pop(key)
+                self.entries[key] = value
+                return value
+            self.misses += 1
+
+        # Build outside of the lock, in case building is slow
+        value = factory()
+        nbytes = value_nbytes(value)
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return value
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= value_nbytes(self.entries.pop(key))
+            self.entries[key] = value
+            self.nbytes += nbytes
+            while len(self.entries) > self.maxsize or \
+                    (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self.nbytes -= value_nbytes(self.entries.popitem(last=False)[1])
+        return value
+
+    def clear(self):
+        """
+        Drop every cached entry and reset the hit/miss counters
+        """
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return a dictionary of the cache's `hits`, `misses`, `size`, `maxsize`, `nbytes`
+        and `maxbytes`
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+            }
+
+
+# Windows and other read-only tables (twiddle factors, filterbanks) are cached here
+# so that repeatedly calculating transforms with the same parameters skips
+# rebuilding them.  Filterbanks grow with the number of filters and their length, so
+# the byte limit keeps a few large ones from being pinned in memory; a table larger
+# than the limit is rebuilt on every call instead.
+window_cache = LRUCache(maxbytes=64 << 20)
+
+# Scratch buffers for FFT inputs are cached here, so that repeated transforms of the
+# same size skip reallocating them.  The byte limit keeps buffers sized by the input
+# signal, rather than by a block size, from being pinned in memory.
+buffer_cache = LRUCache(maxbytes=16 << 20)
+
+
+def cached_window(windowfunc, N, dtype=None):
+    """
+    Return the read-only window `windowfunc(N)`, cast to `dtype` if it is given,
+    caching it in `window_cache` keyed by `(N, dtype, windowfunc)`.  Note that a window
+    function built anew on every call (such as a lambda) is never found in the cache.
+    """
+    if dtype is not None:
+        dtype = as_dtype(dtype)
+
+    def build():
+        window = asarray(windowfunc(N), dtype=dtype)
+        window.flags.writeable = False
+        return window
+    return window_cache.get((N, dtype, windowfunc), build)
+
+
+def work_buffer(shape, dtype, name):
+    """
+    Return an uninitialised scratch array of the given `shape` and `dtype`, caching it
+    in `buffer_cache` so that the next call with the same parameters reuses it.  Each
+    thread gets its own buffer, and `name` separates the buffers of different callers,
+    but a buffer is only valid until its caller next asks for it: it must never be
+    returned or held onto.  Buffers larger than `buffer_cache.maxbytes` are allocated
+    afresh on every call instead.
+    """
+    dtype = as_dtype(dtype)
+    shape = tuple(shape)
+    key = (shape, dtype, name, current_thread().ident)
+    return buffer_cache.get(key, lambda: empty(shape, dtype=dtype))
@@ -1,5 +1,9 @@
 from numpy import *
 from scipy import *
+from scipy.fftpack import fft
+from numpy.lib.stride_tricks import as_strided
+from multiprocessing.pool import ThreadPool
+from .cache import window_cache
 
 # Implements the Generalized Time-Frequency Representation defined in [1]:
 # See [2,3] for more background and some exciting applications of mathiness.
@@ -69,6 +73,64 @@ def MixedWindow(tau, alpha):
     return g(tau, beta=1, p=2, c=1, alpha=alpha)
 
 
+def build_gckd_window(N, g_hat=MixedWindow, alpha=0):
+    """
+    Sample a GCKD window function at lags `0 <= k < N`, halving the zero lag as the
+    distribution is built from one side of a symmetric window.  The window function is
+    sampled at every lag at once, falling back to one lag at a time for window
+    functions that only accept scalars.
+
+    Parameters
+    ----------
+    N : int
+        Desired frequency resolution in bins
+    g_hat : function
+        A GCKD window function such as `ZhaoAtlasWindow`, or `MixedWindow`
+    alpha : float
+        Tune the angle of the cone kernel
+    """
+    try:
+        window = array(g_hat(arange(N), alpha=alpha), dtype=float64)
+    except TypeError:
+        window = None
+    if window is None or window.shape != (N,):
+        window = array([g_hat(k, alpha=alpha) for k in range(N)], dtype=float64)
+    window[0] *= 0.5
+    return window
+
+
+def gckd_window(N, g_hat=MixedWindow, alpha=0, dtype=float64):
+    """
+    Return the read-only window built by `build_gckd_window()` in the (real)
+    precision of `dtype`, caching it in `window_cache` so that distributions with the
+    same parameters share it.
+    """
+    dtype = finfo(dtype).dtype
+
+    def build():
+        window = build_gckd_window(N, g_hat, alpha).astype(dtype)
+        window.flags.writeable = False
+        return window
+    return window_cache.get((N, dtype, g_hat, alpha), build)
+
+
+def dft_twiddles(N, lo, hi, dtype=float64):
+    """
+    Return the read-only `(hi - lo, N)` cosine and sine terms of an `N`-point DFT
+    evaluated at bins `lo <= b < hi`, in the precision of `dtype`, caching them in
+    `window_cache` so that pruned DFTs over the same bins share them.
+    """
+    dtype = finfo(dtype).dtype
+
+    def build():
+        theta = 2 * pi * outer(arange(lo, hi), arange(N)) / N
+        twiddles = (cos(theta).astype(dtype), sin(theta).astype(dtype))
+        for t in twiddles:
+            t.flags.writeable = False
+        return twiddles
+    return window_cache.get((N, dtype, "dft", lo, hi), build)
+
+
 class GCKD:
     """
     Calculate the Generalized Cone-Kernel Distribution of signals, providing superior resolution
@@ -76,7 +138,8 @@ class GCKD:
     short-time fourier transform or Wigner distribution.
 
     Construct this object with the desired parameters, then calculate the GCKD with the calculate()
-    member function, passing in the desired
+    member function, passing in the desired signal.  Alternatively, feed a continuous stream into
+    the push() member function one chunk at a time, calling flush() once the stream has ended.
 
     Constructor parameters
     ----------------------
@@ -84,50 +147,287 @@ class GCKD:
         Desired frequency resolution in bins
     g_hat : function
         Pass in a GCKD window function such as `ZhaoAtlasWindow`, or `MixedWindow`
+    dtype : numpy dtype
+        Precision to calculate the distribution in, e.g. `float32` or `complex64` for
+        single precision.  Complex input signals are always calculated in the complex
+        counterpart of this precision (default `float64`)
     """
 
-    def __init__(self, N, g_hat=MixedWindow):
+    def __init__(self, N, g_hat=MixedWindow, dtype=float64):
         # Initialize static variables that we won't ever change
         self.N = N
         self.M = 2 * N + 1
         self.alpha = -log(.001) / (abs(N)**2)
-        self.window = empty((N,))
+        self.dtype = finfo(dtype).dtype
+        self.window = gckd_window(N, g_hat, self.alpha, self.dtype)
 
-        # Build up window now
-        self.window[0] = 0.5 * g_hat(0, alpha=self.alpha)
-        for k in range(1, N):
-            self.window[k] = g_hat(k, alpha=self.alpha)
+        self.reset()
 
     def y(self, x, L, n, k):
         v0 = n + k + 4 * L
         v1 = n + 4 * L
         a_k = abs(k)
-        return vdot(x[v0 - a_k:v0 + a_k], x[v1 - a_k:v1 + a_k])
+        return vdot(x[v1 - a_k:v1 + a_k], x[v0 - a_k:v0 + a_k])
+
+    def signal_dtype(self, x):
+        """
+        Return the dtype that the signal `x` is calculated in, i.e. `dtype` for real
+        signals and its complex counterpart for complex (e.g. analytic) signals
+        """
+        if iscomplexobj(x):
+            return result_type(self.dtype, complex64)
+        return self.dtype
+
+    def lag_products(self, x, start, stop, step=1):
+        """
+        Calculate `y(x, N, n, k)` for every `step`'th time index `start <= n < stop` and
+        every lag `0 <= k < N` at once, returning a `(len(range(start, stop, step)), N)`
+        array.  `x` must already be padded with `4*N` zeros on either side.
+
+        Every lag product for time index `n` reads from `x[n + 3*N:n + 6*N]`, so we
+        lay those spans out as the rows of a zero-copy strided view and sum each lag
+        across the whole block of rows with a single vectorized call.
+        """
+        N = self.N
+        nrows = len(range(start, stop, step))
+        x = x[start + 3 * N:stop + 6 * N]
+        s = x.strides[0]
+        frames = as_strided(x, shape=(nrows, 3 * N), strides=(step * s, s))
+        cframes = frames
+        if iscomplexobj(x):
+            cx = conj(x)
+            cframes = as_strided(cx, shape=(nrows, 3 * N), strides=(step * cx.strides[0], cx.strides[0]))
+
+        Y = zeros((nrows, N), dtype=x.dtype)
+        for k in range(1, N):
+            Y[:, k] = einsum('ij,ij->i', frames[:, N:N + 2 * k], cframes[:, N - k:N + k])
+        return Y
+
+    def recursive_lag_products(self, x, start, stop, step=1):
+        """
+        Calculate the same lag products as `lag_products()`, but in O(N) operations per
+        time index rather than O(N^2).  Consecutive time indices share all but two
+        terms of every lag sum, so only the lag products at `start` are summed
+        directly; every later time index adds the entering product and subtracts
+        the leaving one, all of which is done with one cumulative sum down the block.
+        The direct sum at the start of each block bounds any floating-point drift.
+        The running sums must visit every time index, even when `step` skips some.
+        """
+        N = self.N
+        stop = start + (len(range(start, stop, step)) - 1) * step + 1
+        Y = empty((stop - start, N), dtype=x.dtype)
+        Y[0] = self.lag_products(x, start, start + 1)[0]
+
+        # Row r of frames holds x[m - N:m + 2*N] for m = start + r + 4*N, the
+        # entering product for lag k is x[m + 2*k] * conj(x[m + k]) and the
+        # leaving product is x[m] * conj(x[m - k])
+        x = x[start + 3 * N:stop + 6 * N]
+        s = x.strides[0]
+        frames = as_strided(x, shape=(stop - start - 1, 3 * N), strides=(s, s))
+        k = arange(N)
+        Y[1:] = frames[:, N + 2 * k] * conj(frames[:, N + k])
+        Y[1:] -= frames[:, N:N + 1] * conj(frames[:, N - k])
+        return cumsum(Y, axis=0, out=Y)[::step]
+
+    def frequency_bins(self, fmin=None, fmax=None, fs=2.0):
+        """
+        Return the half-open range `(lo, hi)` of FFT bins whose frequencies lie within
+        `[fmin, fmax]`.  Bin `b` lies at `b*fs/N` Hz, and the full distribution
+        returned by calculate() holds bins `1` through `N//2`.
+        """
+        lo, hi = 1, self.N // 2 + 1
+        if fmin is not None:
+            lo = max(lo, int(ceil(fmin * self.N / fs)))
+        if fmax is not None:
+            hi = min(hi, int(floor(fmax * self.N / fs)) + 1)
+        return lo, max(lo, hi)
 
-    def calculate(self, x):
+    def transform_lags(self, Y, bins=None):
+        """
+        Window a block of lag products as returned by `lag_products()` and transform
+        them along the lag axis, returning the `(hi - lo, len(Y))` block of the
+        distribution for the FFT bins `bins = (lo, hi)` (default: all N//2 bins).
+
+        A single batched FFT is used unless only a handful of bins are wanted, in
+        which case a pruned DFT against just those bins is cheaper.
+        """
+        if bins is None:
+            bins = (1, self.N // 2 + 1)
+        lo, hi = bins
+
+        Y = Y * self.window
+        if hi - lo >= log2(self.N):
+            return 4 * real(fft(Y, axis=1))[:, lo:hi].T
+
+        # Only the real part of the DFT survives, so split it into cosine and sine terms
+        cos_theta, sin_theta = dft_twiddles(self.N, lo, hi, self.dtype)
+        P = dot(cos_theta, real(Y).T)
+        if iscomplexobj(Y):
+            P += dot(sin_theta, imag(Y).T)
+        return 4 * P
+
+    def calculate(self, x, method="recursive", block_size=1024, workers=1, step=1, fmin=None, fmax=None, fs=2.0):
+        """
+        Calculate the GCKD of `x`, returning an `(N//2, len(x))` array, or only the
+        requested band and time indices if `step`, `fmin` or `fmax` are given.
+
+        Parameters
+        ----------
+        x : 1-D signal array
+            Preferrably a numpy array
+        method : string
+            How to calculate the lag products.  One of:
+            * "vectorized": lag products for `block_size` time indices are
+                calculated at once, followed by a single batched FFT
+            * "recursive": like "vectorized", but lag products are updated from
+                one time index to the next by running sums, see
+                `recursive_lag_products()` (default)
+            * "loop": the reference implementation, calculating each lag product
+                and FFT one time index at a time
+        block_size : int
+            Number of time indices to calculate at once in "vectorized" and "recursive"
+            modes (default 1024)
+        workers : int
+            Number of threads to spread blocks of time indices across in "vectorized"
+            and "recursive" modes (default 1)
+        step : int
+            Only calculate every `step`'th column of the distribution (default 1).  The
+            "recursive" method must still visit every time index, so for large `step`
+            the "vectorized" method, which skips them entirely, can be faster.
+        fmin, fmax : float
+            Only calculate the frequency bins within `[fmin, fmax]` Hz, see
+            frequency_bins() (default: all bins)
+        fs : float
+            Sampling rate in Hz, used to interpret `fmin` and `fmax` (default 2.0)
+        """
         # Gotta do this padding first
+        x = asarray(x)
         self.xLen = len(x)
-        x = hstack([(4 * self.N) * [0], x, (4 * self.N) * [0]])
+        padding = zeros(4 * self.N, dtype=self.signal_dtype(x))
+        x = hstack((padding, x.astype(padding.dtype), padding))
+        bins = self.frequency_bins(fmin, fmax, fs)
+
+        if method != "loop":
+            return self.calculate_padded(x, 0, self.xLen, method, block_size, workers, step, bins)
 
         # Copy these out just to save on some typing
-        cx = conj(x)
         window = self.window
         y = self.y
         N = self.N
-        N_2 = N // 2
-        M = self.M
 
-        P = zeros((N_2, self.xLen))
-        for n in range(self.xLen):
-            P[:, n] = real(fft([(window[k] * y(x, N, n, k))
-                                for k in range(N)]))[1:N_2 + 1]
+        P = zeros((bins[1] - bins[0], len(range(0, self.xLen, step))), dtype=self.dtype)
+        for n in range(0, self.xLen, step):
+            P[:, n // step] = real(fft([(window[k] * y(x, N, n, k))
+                                        for k in range(N)]))[bins[0]:bins[1]]
         return 4 * array(P)
 
+    def calculate_padded(self, x, start, stop, method="recursive", block_size=1024, workers=1, step=1, bins=None):
+        """
+        Calculate the GCKD columns for every `step`'th time index `start <= n < stop` of
+        a signal `x` that has already been padded with `4*N` zeros on either side,
+        restricted to the FFT bins `bins = (lo, hi)` (default: all N//2 bins).  See
+        calculate() for the remaining parameters.
+
+        Blocks of columns only read from the (shared) padded signal, so when `workers`
+        is greater than one they are handed out to a pool of threads, each of which
+        writes its block straight into the output array.  The heavy lifting is all
+        done by numpy, which releases the GIL while it crunches.
+        """
+        if method == "vectorized":
+            lag_products = self.lag_products
+        elif method == "recursive":
+            lag_products = self.recursive_lag_products
+        else:
+            raise ValueError("Unrecognized `method` value: " + method)
+
+        if bins is None:
+            bins = (1, self.N // 2 + 1)
+        P = empty((bins[1] - bins[0], len(range(start, stop, step))), dtype=self.dtype)
+
+        # Keep every block lined up on a column that we actually want
+        block_size = max(block_size // step, 1) * step
+
+        def calculate_block(idx):
+            idx_stop = min(idx + block_size, stop)
+            col = (idx - start) // step
+            Y = lag_products(x, idx, idx_stop, step)
+            P[:, col:col + len(Y)] = self.transform_lags(Y, bins)
+
+        blocks = range(start, stop, block_size)
+        if workers > 1 and len(blocks) > 1:
+            pool = ThreadPool(min(workers, len(blocks)))
+            try:
+                pool.map(calculate_block, blocks)
+            finally:
+                pool.close()
+        else:
+            for idx in blocks:
+                calculate_block(idx)
+        return P
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        # The stream buffer always begins `4*N` samples before the next column to be
+        # calculated, exactly as calculate() pads the beginning of its input
+        self.stream_buff = zeros(4 * self.N, dtype=self.dtype)
+        self.stream_len = 0
+        self.stream_cols = 0
+
+    def push(self, x, method="recursive", block_size=1024, step=1, fmin=None, fmax=None, fs=2.0):
+        """
+        Feed the next chunk of a continuous stream into the GCKD, returning an array of
+        every column that has been completed by this chunk, one column per time index.
+        Column `n` depends on samples up to `n + 2*N - 1`, so columns lag the input by
+        `2*N - 1` samples; call flush() at the end of the stream to get the rest.
+        Concatenating every returned array yields the same result as calculate().
+
+        Parameters
+        ----------
+        x : 1-D signal array
+            The next chunk of the stream, of any length
+        method, block_size, step, fmin, fmax, fs :
+            See calculate(), these should not change over the course of a stream
+        """
+        x = asarray(x)
+        self.stream_buff = hstack((self.stream_buff, x.astype(self.signal_dtype(x))))
+        self.stream_len += len(x)
+        ncols = len(self.stream_buff) - 6 * self.N + 1
+        return self.drain_stream(ncols, method, block_size, step, self.frequency_bins(fmin, fmax, fs))
+
+    def flush(self, method="recursive", block_size=1024, step=1, fmin=None, fmax=None, fs=2.0):
+        """
+        End the stream fed in through push(), returning the remaining columns and
+        resetting the stream.  See push() for parameters.
+        """
+        self.stream_buff = hstack((self.stream_buff, zeros(4 * self.N, dtype=self.dtype)))
+        ncols = self.stream_len - self.stream_cols
+        P = self.drain_stream(ncols, method, block_size, step, self.frequency_bins(fmin, fmax, fs))
+        self.reset()
+        return P
+
+    def drain_stream(self, ncols, method, block_size, step, bins):
+        """
+        Calculate the next `ncols` columns of the stream, then discard consumed history
+        """
+        ncols = max(ncols, 0)
+
+        # Stay in step with the columns that calculate() would have returned
+        start = -self.stream_cols % step
+        P = self.calculate_padded(self.stream_buff, min(start, ncols), ncols, method, block_size,
+                                  step=step, bins=bins)
+
+        # Only hold onto the history needed by the columns that have yet to be calculated
+        self.stream_buff = self.stream_buff[ncols:]
+        self.stream_cols += ncols
+        return P
+
 
 # Given a signal x and a frequency resolution parameter NFFT, calculate the
 # generalized cone kernel distribution of x across every time point and
 # frequency
-def gckd(x, NFFT):
+def gckd(x, NFFT, method="recursive", dtype=float64):
     """
     Convenience method when all you really want to do is crunch through some data.
     Uses `MixedWindow` by default.  Crank up N for a good time, and a warm CPU.
@@ -138,5 +438,9 @@ def gckd(x, NFFT):
         Preferrably a numpy array
     N : int
         Desired frequency resolution in bins.
+    method : string
+        How to calculate the lag products, see `GCKD.calculate()` (default "recursive")
+    dtype : numpy dtype
+        Precision to calculate the distribution in, see `GCKD` (default `float64`)
     """
-    return GCKD(NFFT, MixedWindow).calculate(x)
+    return GCKD(NFFT, MixedWindow, dtype).calculate(x, method=method)
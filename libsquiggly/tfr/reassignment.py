@@ -0,0 +1,167 @@
+from numpy import *
+from scipy import *
+from scipy.signal import *
+from numpy import absolute, log10, multiply, sqrt
+from numpy.fft import fft, rfft
+from .cache import window_cache
+from .short_time_fourier_transform import stft_frames, stft_pad
+
+# Implements the reassigned spectrogram of [1] and the synchrosqueezed STFT of [2].
+# Every STFT value is moved from the time/frequency cell it was calculated in to the
+# centre of gravity of the energy within that cell, which the STFTs of two extra
+# windows (the derivative of the analysis window, and the window weighted by time)
+# locate exactly for sinusoids and impulses.
+#
+# [1] Auger, F., & Flandrin, P. (1995). Improving the readability of time-frequency
+# and time-scale representations by the reassignment method. IEEE Transactions on
+# Signal Processing, 43(5), 1068-1089.
+#
+# [2] Thakur, G., & Wu, H.-T. (2011). Synchrosqueezing-based recovery of
+# instantaneous frequency from nonuniform samples. SIAM Journal on Mathematical
+# Analysis, 43(5), 2078-2095.
+
+
+def reassignment_windows(windowfunc, NFFT):
+    """
+    Return the read-only `(3, NFFT)` stack of the analysis window `windowfunc(NFFT)`,
+    its derivative (per sample) and the window weighted by the time (in samples)
+    from the centre of the frame, caching it in `window_cache`.
+    """
+    def build():
+        h = asarray(windowfunc(NFFT), dtype=float64)
+        windows = array([h, gradient(h), (arange(NFFT) - NFFT // 2) * h])
+        windows.flags.writeable = False
+        return windows
+    return window_cache.get((NFFT, float64, windowfunc, "reassignment"), build)
+
+
+def reassigned_stft(x, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwich",
+                    block_size=1024, mode="reassign", output="magnitude", axis=-1):
+    """
+    Calculate the reassigned spectrogram or synchrosqueezed short-time fourier
+    transform of an input signal x.  Both sharpen the spectrogram of `x` by moving
+    each STFT value to the instantaneous frequency (and, when reassigning, the group
+    delay) measured within its time/frequency cell, giving sinusoids and chirps
+    nearly single-bin tracks for two extra FFTs per frame.  Unlike `gckd()`, which is
+    calculated at every sample, this keeps the hop of the spectrogram, making for a
+    far cheaper input to trackers such as `max_peak()`.
+
+    Parameters
+    ----------
+    x : 1-D signal array
+            Preferrably a numpy array.  N-D arrays hold one signal per channel along
+            `axis`, and every channel is transformed in the same batched FFT
+    NFFT, fs, noverlap, windowfunc, zeropadding, axis :
+            See `stft()`
+    block_size : int
+            Number of frames (summed across channels) to transform at once (default
+            1024).  Every frame is transformed against three windows at once.
+    mode : string
+            How to sharpen the spectrogram.  One of:
+            * "reassign": the power of every STFT value is moved in both frequency
+                and time (default)
+            * "synchrosqueeze": the complex STFT values are moved in frequency only,
+                and summed coherently, keeping their phase
+    output : string
+            What to return for every time/frequency cell.  One of:
+            * "complex": the summed complex STFT values (only when synchrosqueezing)
+            * "magnitude": the magnitude (default)
+            * "power": the squared magnitude
+            * "db": the magnitude in decibels, `20*log10(magnitude)`
+
+    Returns
+    -------
+    P : array
+            The `(NFFT/2, len(x) // (NFFT - noverlap))` sharpened spectrogram of `x`,
+            laid out as by `stft()`
+    """
+
+    if noverlap >= NFFT:
+        raise ValueError(
+            "`noverlap` (%d) must be less than or equal to `NFFT` (%d)" % (noverlap, NFFT))
+    if not mode in ["reassign", "synchrosqueeze"]:
+        raise ValueError("Unrecognized `mode` value: " + mode)
+    if not output in ["complex", "magnitude", "power", "db"]:
+        raise ValueError("Unrecognized `output` value: " + output)
+    if output == "complex" and mode != "synchrosqueeze":
+        raise ValueError("Only synchrosqueezing can calculate complex `output`")
+
+    x = moveaxis(asarray(x), axis, -1)
+    step = (NFFT - noverlap)
+    x, nlen = stft_pad(x, NFFT, step, zeropadding)
+    NFFT_2 = NFFT // 2
+    channels = x.shape[:-1]
+    nchannels = int(prod(channels))
+    windows = reassignment_windows(windowfunc, NFFT)
+
+    # Real signals only need the positive half of the spectrum
+    transform = fft if iscomplexobj(x) else rfft
+    frames = stft_frames(x, NFFT, step, nlen).reshape((nchannels, nlen, NFFT))
+
+    # Values are summed into a flattened (frames, channels, bins) array, so that the
+    # cells any one block of frames can land in are contiguous
+    squeeze = mode == "synchrosqueeze"
+    P = zeros(nlen * nchannels * NFFT_2, dtype=complex128 if squeeze else float64)
+    bins = arange(NFFT_2)
+    channel_offsets = (arange(nchannels) * NFFT_2)[:, newaxis, newaxis]
+
+    # Synchrosqueezing sums STFT values coherently, so their phases are referenced to
+    # the centre of the frame rather than its start
+    centre_phase = exp(2j * pi * bins * (NFFT // 2) / NFFT)
+
+    block_size = max(block_size // (3 * nchannels), 1)
+    for idx in range(0, nlen, block_size):
+        idx_stop = min(idx + block_size, nlen)
+
+        # Transform every frame against all three windows in one batched FFT
+        spectra = transform(frames[:, newaxis, idx:idx_stop, :] * windows[:, newaxis, :], axis=-1)
+        X, X_dh, X_th = [spectra[:, k, :, :NFFT_2] for k in range(3)]
+
+        # Work on real and imaginary parts, to spare complex temporaries
+        power = X.real * X.real + X.imag * X.imag
+        keep = power > 0
+        inv_power = 1 / where(keep, power, 1)
+
+        # Instantaneous frequency (in bins) and group delay (in frames) of each cell,
+        # clipped to just outside the spectrogram before being rounded to a cell
+        freqs = X_dh.imag * X.real
+        freqs -= X_dh.real * X.imag
+        freqs *= inv_power
+        freqs *= -NFFT / (2 * pi)
+        freqs += bins
+        freqs = rint(freqs.clip(-1, NFFT_2, out=freqs)).astype(intp)
+        times = arange(idx, idx_stop)[:, newaxis]
+        if not squeeze:
+            delays = X_th.real * X.real
+            delays += X_th.imag * X.imag
+            delays *= inv_power / step
+            delays += times
+            times = rint(delays.clip(-1, nlen, out=delays)).astype(intp)
+        keep &= (freqs >= 0) & (freqs < NFFT_2) & (times >= 0) & (times < nlen)
+
+        # Sum every value into its new cell, within the span of frames it can land in
+        targets = (times * nchannels * NFFT_2 + channel_offsets + freqs)[keep]
+        values = (X * centre_phase)[keep] if squeeze else power[keep]
+        if len(targets) == 0:
+            continue
+        lo = targets.min()
+        span = targets.max() - lo + 1
+        if squeeze:
+            P[lo:lo + span] += bincount(targets - lo, real(values), span) + \
+                1j * bincount(targets - lo, imag(values), span)
+        else:
+            P[lo:lo + span] += bincount(targets - lo, values, span)
+
+    P = moveaxis(P.reshape((nlen, nchannels, NFFT_2)), 0, -1).reshape(channels + (NFFT_2, nlen))
+    if output == "complex":
+        return P
+    if squeeze:
+        P = absolute(P)
+        if output == "power":
+            multiply(P, P, out=P)
+    elif output != "power":
+        sqrt(P, out=P)
+    if output == "db":
+        log10(P, out=P)
+        P *= 20
+    return P
@@ -1,16 +1,113 @@
 from numpy import *
 from scipy import *
 from scipy.signal import *
+from numpy import absolute, log10, multiply
+from numpy.lib.stride_tricks import as_strided
+from .cache import cached_window, work_buffer
+try:
+    # scipy.fft can spread a batch of transforms across threads
+    from scipy.fft import fft, ifft, rfft, irfft
+    fft_workers = True
+except ImportError:
+    from numpy.fft import fft, ifft, rfft, irfft
+    fft_workers = False
 
 
-def stft(x, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwich"):
+def stft_frames(x, NFFT, step, nframes):
+    """
+    Return a zero-copy `x.shape[:-1] + (nframes, NFFT)` view of `x`, whose rows are
+    the analysis frames `x[..., idx * step:idx * step + NFFT]`.  The last axis of `x`
+    must be long enough to hold every frame.
+    """
+    x = ascontiguousarray(x)
+    s = x.strides[-1]
+    return as_strided(x, shape=x.shape[:-1] + (nframes, NFFT), strides=x.strides[:-1] + (step * s, s))
+
+
+def stft_output(shape, output="magnitude", out=None):
+    """
+    Return the array of the given `shape` that a short-time fourier transform with
+    the given `output` mode will be written into: `out` itself if it is given (after
+    checking that it fits), otherwise a newly allocated array.
+    """
+    if output not in ("complex", "magnitude", "power", "db"):
+        raise ValueError("Unrecognized `output` value: " + output)
+
+    if out is None:
+        return empty(shape, dtype=complex128 if output == "complex" else float64)
+    if out.shape != shape:
+        raise ValueError("`out` has shape %s, but the output has shape %s" % (out.shape, shape))
+    if output == "complex" and not iscomplexobj(out):
+        raise ValueError("`out` must be complex when `output` is \"complex\"")
+    return out
+
+
+def stft_bins(x, NFFT, full_spectrum=False):
+    """
+    Return the number of frequency bins a short-time fourier transform of `x` keeps:
+    `NFFT/2` normally, or with `full_spectrum` every bin needed to invert it, i.e.
+    `NFFT/2 + 1` for real signals and `NFFT` for complex signals.
+    """
+    if not full_spectrum:
+        return NFFT // 2
+    if iscomplexobj(x):
+        return NFFT
+    return NFFT // 2 + 1
+
+
+def transform_frames(x, window, step, nframes, block_size=1024, output="magnitude", out=None,
+                     full_spectrum=False, workers=1):
+    """
+    Window and transform the first `nframes` frames along the last axis of `x` (see
+    `stft_frames()`), returning the `x.shape[:-1] + (nbins, nframes)` spectra in the
+    form requested by `output` (see `stft()`, `stft_bins()`).  Every channel is
+    transformed in the same batched FFT, `block_size` frames (across all channels) at
+    a time, spread across `workers` threads where scipy.fft is available.  Every
+    `output` mode is calculated in place within the output array, which is `out` if
+    it is given.  This is the kernel shared by `stft()` and `STFT`.
+    """
+    NFFT = len(window)
+    nbins = stft_bins(x, NFFT, full_spectrum)
+    channels = x.shape[:-1]
+    P = stft_output(channels + (nbins, nframes), output, out)
+
+    # Real signals only need the positive half of the spectrum
+    transform = fft if iscomplexobj(x) else rfft
+    fft_kwargs = {"workers": workers} if fft_workers else {}
+
+    frames = stft_frames(x, NFFT, step, nframes)
+    block_size = max(block_size // int(prod(channels)), 1)
+    windowed = work_buffer(channels + (min(block_size, nframes), NFFT), result_type(x, window), "stft")
+    for idx in range(0, nframes, block_size):
+        idx_stop = min(idx + block_size, nframes)
+        w = windowed[..., :idx_stop - idx, :]
+        multiply(frames[..., idx:idx_stop, :], window, out=w)
+        spectra = transform(w, axis=-1, **fft_kwargs)[..., :nbins].swapaxes(-1, -2)
+
+        P_block = P[..., idx:idx_stop]
+        if output == "complex":
+            P_block[...] = spectra
+            continue
+
+        absolute(spectra, out=P_block)
+        if output == "power":
+            multiply(P_block, P_block, out=P_block)
+        elif output == "db":
+            log10(P_block, out=P_block)
+            P_block *= 20
+    return P
+
+
+def stft(x, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwich", block_size=1024,
+         output="magnitude", out=None, axis=-1, full_spectrum=False, workers=1):
     """
     Calculate the short-time fourier transform of an input signal x
 
     Parameters
     ----------
     x : 1-D signal array
-            Preferrably a numpy array
+            Preferrably a numpy array.  N-D arrays hold one signal per channel along
+            `axis`, and every channel is transformed in the same batched FFT
     NFFT : int
             Desired frequency resolution in bins (default 256)
     fs : float
@@ -26,28 +123,356 @@ def stft(x, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwi
                     `NFFT/2 + pad_amnt` zeros added to the end of `x`
             `pad_amnt` is the number of samples required to pad `x` to the nearest
             integer multiple of `NFFT`. Default padding strategy is "sandwich", which
-            yields nice properties when lining up time indices
+            yields nice properties when lining up time indices.  With "after", any
+            frames that would run off the end of the padded `x` are padded further
+            with zeros.
+    block_size : int
+            Number of frames (summed across channels) to transform at once, bounding
+            the memory used by the windowed copies of the (overlapping) frames
+            (default 1024)
+    output : string
+            What to calculate from each fourier transform.  One of:
+            * "complex": the complex spectrum itself, with phase
+            * "magnitude": the magnitude of the spectrum (default)
+            * "power": the squared magnitude of the spectrum
+            * "db": the magnitude of the spectrum in decibels, `20*log10(magnitude)`
+    out : array
+            Optional preallocated output array to write into and return, so that
+            repeated calls can reuse memory.  It must be complex if `output` is "complex"
+    axis : int
+            The time axis of `x` (default -1)
+    full_spectrum : bool
+            Keep every frequency bin needed to invert the transform with `istft()`:
+            `NFFT/2 + 1` bins (up to and including nyquist) for real `x`, or all `NFFT`
+            bins for complex `x`, instead of `NFFT/2` (default False)
+    workers : int
+            Number of threads to spread each batch of FFTs across (default 1).  This
+            needs scipy.fft (scipy 1.4 or later), and is ignored when falling back to
+            numpy.fft.  -1 uses every CPU.
+
+    Returns
+    -------
+    P : array
+            The `(NFFT/2, len(x) // (NFFT - noverlap))` spectrogram of `x`.  For N-D
+            `x`, the remaining axes of `x` come first, e.g. a `(channels, samples)`
+            array yields a `(channels, NFFT/2, frames)` array
     """
 
     if noverlap >= NFFT:
         raise ValueError(
             "`noverlap` (%d) must be less than or equal to `NFFT` (%d)" % (noverlap, NFFT))
+    x = moveaxis(asarray(x), axis, -1)
     step = (NFFT - noverlap)
-    pad_amnt = step - len(x) % step
+    x, nlen = stft_pad(x, NFFT, step, zeropadding)
+    window = cached_window(windowfunc, NFFT)
+    return transform_frames(x, window, step, nlen, block_size, output, out, full_spectrum, workers)
+
 
-    nlen = len(x) // step
+def stft_pad(x, NFFT, step, zeropadding="sandwich"):
+    """
+    Zero-pad the last axis of `x` as described by `zeropadding` (see `stft()`),
+    returning the padded signal and the number of frames of hop `step` to analyse in it
+    """
+    xLen = x.shape[-1]
+    pad_amnt = step - xLen % step
+    nlen = xLen // step
     NFFT_2 = NFFT // 2
-    P = empty((NFFT_2, nlen))
-    window = windowfunc(NFFT)
+
+    def padding(n):
+        return zeros(x.shape[:-1] + (n,))
 
     if zeropadding == "sandwich":
-        x = hstack((zeros(NFFT_2), x, zeros(NFFT_2 + pad_amnt)))
+        x = concatenate((padding(NFFT_2), x, padding(NFFT_2 + pad_amnt)), axis=-1)
     elif zeropadding == "after":
-        x = hstack((x, zeros(pad_amnt)))
+        x = concatenate((x, padding(max(pad_amnt, (nlen - 1) * step + NFFT - xLen))), axis=-1)
     else:
         raise ValueError("Unrecognized `zeropadding` value: " + zeropadding)
+    return x, nlen
 
-    for idx in range(nlen):
-        x_slice = x[idx * step:idx * step + NFFT]
-        P[:, idx] = abs(fft(x_slice * window)[:NFFT_2])
-    return P
+
+class STFT:
+    """
+    Calculate the short-time fourier transform of a continuous stream, one chunk at a
+    time.  Feed chunks of any size into push(), which returns the spectrogram columns
+    completed by that chunk, then call flush() once the stream has ended.  Only the
+    samples of the frames that have yet to complete are held onto between chunks.
+    Concatenating every returned array yields the same result as `stft()` with
+    `zeropadding="after"`.
+
+    Constructor parameters
+    ----------------------
+    NFFT, fs, noverlap, windowfunc, block_size, output, full_spectrum, workers :
+        See `stft()`
+    """
+
+    def __init__(self, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, block_size=1024, output="magnitude",
+                 full_spectrum=False, workers=1):
+        if noverlap >= NFFT:
+            raise ValueError(
+                "`noverlap` (%d) must be less than or equal to `NFFT` (%d)" % (noverlap, NFFT))
+        stft_output((NFFT // 2, 0), output)
+        self.NFFT = NFFT
+        self.fs = fs
+        self.step = NFFT - noverlap
+        self.window = cached_window(windowfunc, NFFT)
+        self.block_size = block_size
+        self.output = output
+        self.full_spectrum = full_spectrum
+        self.workers = workers
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        # The stream buffer always begins at the next frame to be transformed
+        self.stream_buff = zeros(0)
+        self.stream_len = 0
+        self.stream_cols = 0
+
+    def push(self, x, out=None):
+        """
+        Feed the next chunk of a continuous stream into the STFT, returning an
+        `(NFFT/2, ncols)` array of every column that has been completed by this chunk.
+
+        Parameters
+        ----------
+        x : 1-D signal array
+            The next chunk of the stream, of any length
+        out : 2-D array
+            Optional preallocated `(NFFT/2, maxcols)` array; the completed columns are
+            written into (and returned as) the view `out[:, :ncols]`, so that a
+            real-time loop can reuse the same memory for every chunk.  `maxcols` must
+            be at least `ncols`
+        """
+        self.stream_buff = hstack((self.stream_buff, x))
+        self.stream_len += len(x)
+        if len(self.stream_buff) < self.NFFT:
+            return self.drain_stream(0, out)
+        return self.drain_stream((len(self.stream_buff) - self.NFFT) // self.step + 1, out)
+
+    def flush(self, out=None):
+        """
+        End the stream fed in through push(), returning the remaining columns (whose
+        frames are padded with zeros) and resetting the stream.  See push() for `out`.
+        """
+        ncols = self.stream_len // self.step - self.stream_cols
+        pad_amnt = max(ncols - 1, 0) * self.step + self.NFFT - len(self.stream_buff)
+        self.stream_buff = hstack((self.stream_buff, zeros(max(pad_amnt, 0), dtype=self.stream_buff.dtype)))
+        P = self.drain_stream(max(ncols, 0), out)
+        self.reset()
+        return P
+
+    def drain_stream(self, ncols, out=None):
+        """
+        Transform the next `ncols` columns of the stream, then discard consumed samples
+        """
+        if out is not None:
+            if out.shape[1] < ncols:
+                raise ValueError("`out` holds %d columns, but %d have completed" % (out.shape[1], ncols))
+            out = out[:, :ncols]
+        P = transform_frames(self.stream_buff, self.window, self.step, ncols, self.block_size,
+                             self.output, out, self.full_spectrum, self.workers)
+        self.stream_buff = self.stream_buff[ncols * self.step:]
+        self.stream_cols += ncols
+        return P
+
+
+def overlap_add(frames, step, out):
+    """
+    Add every frame `frames[..., m, :]` into `out[..., m * step:m * step + NFFT]`.
+    Frames are added one hop-sized slice at a time: slice `k` of every frame lands on
+    a separate (non-overlapping) stretch of `out`, so all frames are added at once
+    through a strided view of `out`, leaving only `ceil(NFFT / step)` python loops.
+    """
+    nframes, NFFT = frames.shape[-2:]
+    s = out.strides[-1]
+    for k in range(0, NFFT, step):
+        width = min(step, NFFT - k)
+        view = as_strided(out[..., k:], shape=out.shape[:-1] + (nframes, width),
+                          strides=out.strides[:-1] + (step * s, s))
+        view += frames[..., k:k + width]
+    return out
+
+
+def istft(P, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, zeropadding="sandwich", length=None,
+          block_size=1024):
+    """
+    Invert a short-time fourier transform calculated by `stft()`, by weighted
+    overlap-add of the inverse transform of every column (see `ISTFT`)
+
+    Parameters
+    ----------
+    P : N-D array
+            The `(..., nbins, frames)` spectrogram to invert, calculated with
+            `full_spectrum=True` and `output="complex"`
+    NFFT, fs, noverlap, windowfunc, zeropadding, block_size :
+            The parameters `P` was calculated with, see `stft()`
+    length : int
+            Number of samples to return (default `frames * (NFFT - noverlap)`, the
+            number of samples a signal of that length is transformed into).  Samples
+            past the end of the spectrogram are zero.
+
+    Returns
+    -------
+    x : array
+            The `(..., length)` signal.  It is complex if `P` holds all `NFFT` bins.
+    """
+
+    P = asarray(P)
+    inverse = ISTFT(NFFT, fs, noverlap, windowfunc, block_size)
+    y = concatenate((inverse.push(P), inverse.flush()), axis=-1)
+    if length is None:
+        length = P.shape[-1] * inverse.step
+
+    if zeropadding == "sandwich":
+        y = y[..., NFFT // 2:]
+    elif zeropadding != "after":
+        raise ValueError("Unrecognized `zeropadding` value: " + zeropadding)
+
+    x = zeros(y.shape[:-1] + (length,), dtype=y.dtype)
+    x[..., :min(length, y.shape[-1])] = y[..., :length]
+    return x
+
+
+class ISTFT:
+    """
+    Invert a short-time fourier transform one chunk of columns at a time by weighted
+    overlap-add, the inverse of `STFT`.  Feed spectrogram columns into push(), which
+    returns the samples that no later column can contribute to, then call flush()
+    once the stream has ended.  Each frame is inverted with a batched inverse FFT,
+    windowed again with the synthesis window (the analysis window itself), overlap-
+    added and divided by the sum of the squared windows covering each sample.
+    This reconstructs the signal exactly wherever that sum is nonzero, e.g. every
+    sample for COLA windows such as a periodic hann window at 50% overlap.
+
+    Columns must come from `stft()`/`STFT` with `full_spectrum=True` and
+    `output="complex"`.  Columns holding only `NFFT/2` bins are treated as real
+    spectra whose nyquist bin is zero, so will not reconstruct exactly.
+
+    Constructor parameters
+    ----------------------
+    NFFT, fs, noverlap, windowfunc, block_size :
+        See `stft()`
+    """
+
+    def __init__(self, NFFT=256, fs=2.0, noverlap=128, windowfunc=hann, block_size=1024):
+        if noverlap >= NFFT:
+            raise ValueError(
+                "`noverlap` (%d) must be less than or equal to `NFFT` (%d)" % (noverlap, NFFT))
+        self.NFFT = NFFT
+        self.fs = fs
+        self.step = NFFT - noverlap
+        self.window = cached_window(windowfunc, NFFT)
+        self.block_size = block_size
+        self.window_power = real(self.window * conj(self.window))
+
+        # Away from the ends of the stream, every sample is covered by the same
+        # squared windows, repeating with period `step`, so is normalized by
+        # multiplying by the reciprocal of their sum
+        K = -(-NFFT // self.step)
+        self.norm_steady = self.window_norm(arange((K - 1) * self.step, K * self.step))
+        self.inv_norm_steady = self.inverse_norm(self.norm_steady)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any stream fed in through push(), so that a new stream can be started
+        """
+        # Overlap-added samples that later frames will still add onto
+        self.stream_buff = zeros(self.NFFT - self.step)
+        self.stream_len = 0
+        self.stream_cols = 0
+
+    def window_norm(self, t, ncols=None):
+        """
+        Return the sum of the squared windows of every frame (of the first `ncols`
+        frames, if given) that covers each stream sample `t`
+        """
+        K = -(-self.NFFT // self.step)
+        frames = t // self.step - arange(K)[:, newaxis]
+        offsets = t - frames * self.step
+        valid = (frames >= 0) & (offsets < self.NFFT)
+        if ncols is not None:
+            valid &= frames < ncols
+        return where(valid, self.window_power[offsets.clip(0, self.NFFT - 1)], 0).sum(axis=0)
+
+    def inverse_norm(self, norm):
+        """
+        Return the reciprocal of the sums of squared windows `norm`, zeroing those too
+        small to reconstruct from
+        """
+        nonzero = norm > 1e-10 * self.norm_steady.max()
+        return where(nonzero, 1 / where(nonzero, norm, 1), 0)
+
+    def normalize(self, y, start, ncols=None):
+        """
+        Divide the overlap-added samples `y`, which begin at stream sample `start`, by
+        the sum of the squared windows covering them, zeroing samples too weakly
+        covered to reconstruct.  `ncols` is the number of frames in a finished stream,
+        otherwise `start` and the length of `y` must be multiples of `step`.
+        """
+        step = self.step
+        n = y.shape[-1]
+        if ncols is None:
+            # Only the first hops of the stream see fewer frames than the steady state
+            edge = min(max(-(-(self.NFFT - step - start) // step) * step, 0), n)
+        else:
+            edge = n
+        t = arange(start, start + edge)
+        y[..., :edge] *= self.inverse_norm(self.window_norm(t, ncols))
+
+        steady = y[..., edge:].reshape(y.shape[:-1] + (-1, step))
+        steady *= self.inv_norm_steady
+        return y
+
+    def push(self, P):
+        """
+        Feed the next columns of a spectrogram into the ISTFT, returning the `ncols *
+        step` samples that are complete.
+
+        Parameters
+        ----------
+        P : N-D array
+            The next `(..., nbins, ncols)` columns of the spectrogram of one or more
+            channels.  `nbins == NFFT` columns are inverted to complex samples.
+        """
+        NFFT = self.NFFT
+        step = self.step
+        ncols = P.shape[-1]
+        if P.shape[-2] == NFFT:
+            transform = lambda P: ifft(P, axis=-1)
+            dtype = complex128
+        else:
+            transform = lambda P: irfft(P, n=NFFT, axis=-1)
+            dtype = float64
+
+        # Overlap-add onto the samples carried over from previous columns
+        y = zeros(P.shape[:-2] + (ncols * step + NFFT - step,), dtype=dtype)
+        y[..., :NFFT - step] = self.stream_buff
+        block_size = max(self.block_size // int(prod(P.shape[:-2])), 1)
+        columns = work_buffer(P.shape[:-2] + (min(block_size, ncols), P.shape[-2]), P.dtype, "istft")
+        for idx in range(0, ncols, block_size):
+            idx_stop = min(idx + block_size, ncols)
+            # Transposing the columns into frames first lets each inverse FFT run
+            # along contiguous memory
+            c = columns[..., :idx_stop - idx, :]
+            c[...] = P[..., idx:idx_stop].swapaxes(-1, -2)
+            frames = transform(c)
+            frames *= self.window
+            overlap_add(frames, step, y[..., idx * step:])
+
+        start = self.stream_cols * step
+        self.stream_buff = y[..., ncols * step:]
+        self.stream_cols += ncols
+        self.stream_len += ncols * step
+        return self.normalize(y[..., :ncols * step], start)
+
+    def flush(self):
+        """
+        End the stream fed in through push(), returning the last `NFFT - step` samples
+        and resetting the stream.
+        """
+        y = self.normalize(self.stream_buff.copy(), self.stream_len, self.stream_cols)
+        self.reset()
+        return y
@@ -1,7 +1,7 @@
 from .logging import Tee, start_logging, stop_logging
 from .plotting import imagesc, spectrogram, gckdgram, pause
 from .rollingbuffer import RollingBuffer, clamp
-from .generator_tools import make_gen, collect, acollect
+from .generator_tools import make_gen, collect, acollect, make_chunks, unchunk, stream_chunks
 
 del logging
 del plotting
@@ -27,3 +27,48 @@ def acollect(collection):
     Given some kind of iterator called collection, return array([x for x in collection])
     """
     return array([x for x in collection])
+
+
+def make_chunks(x, chunk_size=4096):
+    """
+    Given sequential data, return an iterator over it in chunks: 1-D arrays of any
+    length.  Arrays (and lists) are split into `chunk_size`-sample chunks, iterators
+    of arrays pass their arrays through, and iterators of scalars (such as the
+    generators that make_gen() works with) yield each scalar as a chunk of its own,
+    so that they are still only consumed as results are wanted.
+    """
+    if isinstance(x, (ndarray, list, tuple)):
+        x = asarray(x)
+        return (x[idx:idx + chunk_size] for idx in range(0, len(x), chunk_size))
+
+    def chunks():
+        for chunk in x:
+            chunk = asarray(chunk)
+            yield chunk.reshape(-1) if chunk.ndim != 1 else chunk
+    return chunks()
+
+
+def unchunk(chunks):
+    """
+    Given an iterator over chunks (as made by make_chunks()), yield their samples one
+    at a time
+    """
+    for chunk in chunks:
+        for x in chunk:
+            yield x
+
+
+def stream_chunks(stream, data, chunk_size=4096):
+    """
+    Feed sequential data into a streaming object (one with push() and flush() member
+    functions, each returning an array of results, such as `MatchedFilter`) one chunk
+    at a time, yielding each nonempty array of results.  This is the block-streaming
+    protocol the streaming functions of libsquiggly.analysis are built on.
+    """
+    for chunk in make_chunks(data, chunk_size):
+        result = stream.push(chunk)
+        if len(result):
+            yield result
+    result = stream.flush()
+    if len(result):
+        yield result